@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import aiohttp
+from telebot import apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+
+class _Response:
+    """Минимальный ответ в духе requests, которого ждёт apihelper"""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.reason = ""
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncRuntime:
+    """Приём обновлений через AsyncTeleBot и общий пул соединений aiohttp.
+
+    Обработчики бота остаются прежними: их выполняют потоки диспетчера,
+    а их запросы к Telegram уходят через ту же сессию aiohttp в цикле событий.
+    """
+
+    def __init__(self, bot, dispatcher, pool_size=50, long_polling_timeout=20):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.long_polling_timeout = long_polling_timeout
+        asyncio_helper.REQUEST_LIMIT = pool_size
+        self.async_bot = AsyncTeleBot(bot.token)
+        self.loop = None
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        apihelper.CUSTOM_REQUEST_SENDER = self._send_request
+        offset = None
+        try:
+            while True:
+                try:
+                    updates = await self.async_bot.get_updates(
+                        offset=offset, timeout=self.long_polling_timeout,
+                        request_timeout=self.long_polling_timeout + 10,
+                    )
+                except Exception as e:
+                    print(f"Ошибка получения обновлений: {e}")
+                    await asyncio.sleep(3)
+                    continue
+                for update in updates:
+                    offset = update.update_id + 1
+                    self.dispatcher.submit(update)
+        finally:
+            apihelper.CUSTOM_REQUEST_SENDER = None
+            await self.async_bot.close_session()
+
+    def _send_request(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Замена requests для синхронного TeleBot: запрос выполняется в цикле событий"""
+        if files:
+            # Отправка файлов идёт прежним путём через requests
+            return apihelper._get_req_session().request(
+                method, url, params=params, files=files, timeout=timeout, proxies=proxies)
+        future = asyncio.run_coroutine_threadsafe(self._request(method, url, params, timeout), self.loop)
+        return future.result()
+
+    async def _request(self, method, url, params, timeout):
+        session = await asyncio_helper.session_manager.get_session()
+        total = timeout[1] if isinstance(timeout, tuple) else timeout
+        params = {key: str(value) for key, value in (params or {}).items() if value is not None}
+        async with session.request(method, url, params=params,
+                                   timeout=aiohttp.ClientTimeout(total=total)) as response:
+            return _Response(response.status, await response.text())
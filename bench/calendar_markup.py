@@ -0,0 +1,35 @@
+"""Сравнение листания календаря: сборка клавиатуры и JSON на каждое нажатие против CalendarCache.
+
+Запуск: python bench/calendar_markup.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_keyboard import CalendarCache, build_calendar, shift_month  # noqa: E402
+
+
+def measure(func, months, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for year, month in months:
+            func(year, month)
+    return (time.perf_counter() - start) / (rounds * len(months)) * 1e6
+
+
+def main(rounds=2000):
+    # Оператор листает на полгода назад и обратно
+    months = [shift_month(2026, 10, -delta) for delta in range(6)]
+    months += list(reversed(months))
+    cache = CalendarCache()
+
+    before = measure(lambda year, month: build_calendar(year, month).to_json(), months, rounds)
+    after = measure(cache.get, months, rounds)
+    print(f"сборка: {before:.1f} мкс на нажатие")
+    print(f"CalendarCache: {after:.1f} мкс на нажатие ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Сквозная нагрузочная проверка бота: N операторов одновременно заполняют отчёты.
+
+Бот запускается целиком (main.py) против заглушки Bot API и таблицы в памяти;
+каждый оператор проходит полный диалог: календарь, оператор, температура,
+блоки АИ-92-К5 и ДТ-К5, должники, подтверждение. В конце печатаются отчёты в
+секунду, p50/p99 задержки шага (от обновления до первого ответа бота) и число
+вызовов Telegram и Google Sheets на отчёт.
+
+Запуск: python bench/e2e.py --operators 20 --reports 3 --sheets-latency-ms 150
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+from fake_sheets import FakeSpreadsheet, install  # noqa: E402
+from fake_telegram import FakeBotApi  # noqa: E402
+
+FIRST_CHAT_ID = 100000
+SAVED_TEXT = "Данные ДТ-К5 сохранены."
+
+
+def report_flow(day):
+    """Шаги полного отчёта за день месяца day: ("say", текст) или ("tap", надпись inline-кнопки)"""
+    return [
+        ("say", "/start"), ("tap", "Создать отчёт"), ("tap", str(day)),
+        ("say", "Оператор 1"), ("say", "15,5"), ("say", "Нет Комментариев"), ("say", "Всё верно, сохранить данные"),
+        ("tap", "Заполнить данные"),
+        ("say", str(1000 + 150 * day)), ("say", "100"), ("say", "50"), ("say", "Сумма АИ-92-К5 за день верна"),
+        ("say", "Нет, в долг не отпускали"), ("say", "Всё верно, сохранить данные"),
+        ("say", str(2000 + 300 * day)), ("say", "200"), ("say", "100"), ("say", "Сумма ДТ-К5 за день верна"),
+        ("say", "Да, отпускали в долг"), ("say", "Контрагент 1"), ("say", "30"), ("say", "Нет, больше не отпускали"),
+        ("say", "Всё верно, сохранить данные"),
+    ]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Operator(threading.Thread):
+    """Оператор в своём чате: отправляет шаг, ждёт ответа бота, отправляет следующий"""
+
+    def __init__(self, api, chat_id, reports, timeout):
+        super().__init__(name=f"operator-{chat_id}", daemon=True)
+        self.api = api
+        self.chat_id = chat_id
+        self.reports = reports
+        self.timeout = timeout
+        self.latencies = defaultdict(list)  # Шаг -> задержки, секунд
+        self.completed = 0
+        self.error = None
+
+    def run(self):
+        try:
+            for report in range(self.reports):
+                self.run_report(day=report % 28 + 1)  # Разные даты: отчёт за ту же дату - конфликт
+                self.completed += 1
+        except Exception as e:
+            self.error = e
+
+    def run_report(self, day):
+        previous = self.api.call_count(self.chat_id)
+        for kind, text in report_flow(day):
+            seen = self.api.call_count(self.chat_id)
+            started = time.perf_counter()
+            if kind == "say":
+                self.api.push_message(self.chat_id, text)
+            else:
+                # Кнопка могла прийти в любом ответе на предыдущий шаг
+                message_id, data = self.api.wait_button(self.chat_id, text, since=previous, timeout=self.timeout)
+                self.api.push_callback(self.chat_id, message_id, data)
+            self.api.wait_calls(self.chat_id, seen + 1, timeout=self.timeout)
+            self.latencies[f"{kind} {text if not text.isdigit() else '<число>'}"].append(
+                time.perf_counter() - started)
+            previous = seen
+        self.api.wait_text(self.chat_id, SAVED_TEXT, since=previous, timeout=self.timeout)
+
+
+def start_bot(api, spreadsheet, args):
+    """Запускает main.py в фоновом потоке во временном каталоге с настройками прогона"""
+    if getattr(args, "record", None):
+        config.UPDATES_RECORD_PATH = os.path.abspath(args.record)
+    os.chdir(tempfile.mkdtemp(prefix="bot-bench-"))
+    install(spreadsheet)
+    config.BOT_TOKEN = "123456:bench"
+    config.TELEGRAM_API_URL = api.url
+    if args.chat_rate is not None:
+        config.TELEGRAM_CHAT_MESSAGES_PER_SECOND = args.chat_rate
+    threading.Thread(target=lambda: __import__("main"), name="bot", daemon=True).start()
+    for _ in range(600):
+        main = sys.modules.get("main")
+        if main is not None and getattr(main, "dispatcher", None) is not None:
+            return main
+        time.sleep(0.05)
+    raise RuntimeError("Бот не запустился за 30 с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--operators", type=int, default=10, help="одновременных операторов (чатов)")
+    parser.add_argument("--reports", type=int, default=2, help="отчётов на оператора")
+    parser.add_argument("--telegram-latency-ms", type=float, default=30, help="задержка ответа Bot API")
+    parser.add_argument("--sheets-latency-ms", type=float, default=150, help="задержка вызова Google Sheets")
+    parser.add_argument("--chat-rate", type=float, default=None,
+                        help="сообщений в чат в секунду (по умолчанию TELEGRAM_CHAT_MESSAGES_PER_SECOND)")
+    parser.add_argument("--timeout", type=float, default=60, help="секунд ожидания ответа бота на шаг")
+    parser.add_argument("--record", help="записать обновления прогона для bench/replay.py (.jsonl.gz)")
+    args = parser.parse_args()
+
+    api = FakeBotApi(latency=args.telegram_latency_ms / 1000)
+    api.start()
+    spreadsheet = FakeSpreadsheet(latency=args.sheets_latency_ms / 1000)
+    bot = start_bot(api, spreadsheet, args)
+    bot.sheets_connection.wait(30)
+
+    operators = [Operator(api, FIRST_CHAT_ID + index, args.reports, args.timeout) for index in range(args.operators)]
+    started = time.perf_counter()
+    for operator in operators:
+        operator.start()
+    for operator in operators:
+        operator.join()
+    elapsed = time.perf_counter() - started
+
+    # Строки доходят до таблицы пачками: ждём, пока журнал опустеет
+    deadline = time.monotonic() + 60
+    while bot.outbox.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    completed = sum(operator.completed for operator in operators)
+    errors = [operator.error for operator in operators if operator.error is not None]
+    latencies = defaultdict(list)
+    for operator in operators:
+        for step, values in operator.latencies.items():
+            latencies[step].extend(values)
+    all_latencies = [value for values in latencies.values() for value in values]
+
+    print(f"операторов: {args.operators}, отчётов: {completed} из {args.operators * args.reports}, "
+          f"время: {elapsed:.1f} с")
+    print(f"отчётов в секунду: {completed / elapsed:.2f}")
+    print(f"задержка шага: p50 {percentile(all_latencies, 0.5) * 1000:.0f} мс, "
+          f"p99 {percentile(all_latencies, 0.99) * 1000:.0f} мс ({len(all_latencies)} шагов)")
+    slowest = sorted(latencies.items(), key=lambda item: percentile(item[1], 0.99), reverse=True)[:5]
+    for step, values in slowest:
+        print(f"  {step}: p50 {percentile(values, 0.5) * 1000:.0f} мс, p99 {percentile(values, 0.99) * 1000:.0f} мс")
+    if completed:
+        telegram_calls = sum(api.calls.values())
+        sheets_calls = sum(spreadsheet.calls.values())
+        print(f"вызовов Telegram на отчёт: {telegram_calls / completed:.1f} "
+              f"({', '.join(f'{method} {count}' for method, count in api.calls.most_common())})")
+        print(f"вызовов Google Sheets на отчёт: {sheets_calls / completed:.2f} "
+              f"({', '.join(f'{method} {count}' for method, count in spreadsheet.calls.most_common())})")
+        rows = sum(len(rows) for rows in spreadsheet.rows().values())
+        print(f"строк в таблице: {rows}, в журнале не доставлено: {bot.outbox.pending_count()}")
+    for error in errors[:5]:
+        print(f"ошибка: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
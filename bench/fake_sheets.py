@@ -0,0 +1,154 @@
+"""Таблица Google Sheets в памяти с задержкой вызовов - для нагрузочных проверок бота.
+
+install() подменяет в gspread открытие таблицы и ключ сервисного аккаунта,
+поэтому бот работает со своим обычным кодом подключения, но без сети.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import gspread
+from google.auth import credentials as google_credentials
+from google.oauth2 import service_account
+
+
+class FakeCredentials(google_credentials.Credentials):
+    """Токен, который не истекает в течение прогона"""
+
+    def __init__(self):
+        super().__init__()
+        self.refresh(None)
+
+    def refresh(self, request):
+        self.token = "bench"
+        self.expiry = datetime.utcnow() + timedelta(days=1)
+
+
+class ErrorResponse:
+    """Ответ Google с ошибкой - из него gspread строит APIError"""
+
+    status_code = 400
+
+    def __init__(self, message):
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text, "status": "INVALID_ARGUMENT"}}
+
+
+class FakeWorksheet:
+    """Лист со строками в памяти; каждый вызов API ждёт latency секунд и учитывается в calls.
+
+    Как и в Google, row_count - размер сетки листа: append_rows со вставкой строк
+    увеличивает его, а чтение за краем сетки - ошибка.
+    """
+
+    def __init__(self, spreadsheet, title, id, rows=1000, cols=26):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = id
+        self.row_count = rows
+        self.col_count = cols
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def append_rows(self, values, insert_data_option=None, table_range=None, **kwargs):
+        self.spreadsheet.api_call("append_rows")
+        with self._lock:
+            first = len(self.rows) + 1
+            self.rows.extend(list(row) for row in values)
+            last = len(self.rows)
+            if insert_data_option == "INSERT_ROWS":
+                self.row_count += len(values)
+            else:
+                self.row_count = max(self.row_count, last)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:Z{last}", "updatedRows": len(values)}}
+
+    def get(self, range_name=None, **kwargs):
+        self.spreadsheet.api_call("get")
+        first, last = 1, None
+        if range_name:
+            # Бот читает диапазоны вида "A12:V1011", а у края сетки - открытые снизу "A12:V":
+            # такой диапазон, как и в Google, возвращает строки до последней заполненной
+            start, _, end = range_name.partition(":")
+            first = int("".join(ch for ch in start if ch.isdigit()) or 1)
+            last = int("".join(ch for ch in end if ch.isdigit()) or 0) or None
+            if max(first, last or 0) > self.row_count:
+                raise gspread.exceptions.APIError(ErrorResponse(
+                    f"Range ('{self.title}'!{range_name}) exceeds grid limits. "
+                    f"Max rows: {self.row_count}, max columns: {self.col_count}"))
+        with self._lock:
+            return [list(row) for row in self.rows[first - 1:last]]
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self.spreadsheet.api_call("update")
+        return {"updatedRange": f"'{self.title}'!{range_name}", "updatedRows": len(values or ())}
+
+    def resize(self, rows=None, cols=None):
+        self.spreadsheet.api_call("resize")
+        self.row_count = rows or self.row_count
+        self.col_count = cols or self.col_count
+
+
+class FakeSpreadsheet:
+    """Таблица из листов FakeWorksheet; первый лист - основной лист отчётов"""
+
+    def __init__(self, latency=0.0, title="АЗС Отчёты"):
+        self.latency = latency
+        self.title = title
+        self.id = "bench-spreadsheet"
+        self.calls = Counter()  # Метод -> число вызовов
+        self._calls_lock = threading.Lock()
+        self._worksheets = [FakeWorksheet(self, "Лист1", 0)]
+
+    def api_call(self, method):
+        with self._calls_lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def sheet1(self):
+        self.api_call("fetch_sheet_metadata")
+        return self._worksheets[0]
+
+    def worksheets(self):
+        self.api_call("fetch_sheet_metadata")
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self.api_call("fetch_sheet_metadata")
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise gspread.exceptions.WorksheetNotFound(title)
+
+    def get_worksheet_by_id(self, id):
+        self.api_call("fetch_sheet_metadata")
+        for worksheet in self._worksheets:
+            if worksheet.id == id:
+                return worksheet
+        raise gspread.exceptions.WorksheetNotFound(id)
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.api_call("add_worksheet")
+        worksheet = FakeWorksheet(self, title, len(self._worksheets), rows, cols)
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def rows(self):
+        """Все строки отчётов по листам (кроме пустых)"""
+        return {worksheet.title: worksheet.rows for worksheet in self._worksheets if worksheet.rows}
+
+
+def install(spreadsheet):
+    """Подменяет подключение gspread: бот откроет spreadsheet по имени или ключу"""
+    service_account.Credentials.from_service_account_file = staticmethod(lambda *args, **kwargs: FakeCredentials())
+
+    def open_spreadsheet(client, *args, **kwargs):
+        spreadsheet.api_call("open")
+        return spreadsheet
+
+    gspread.Client.open = open_spreadsheet
+    gspread.Client.open_by_key = open_spreadsheet
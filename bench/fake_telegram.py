@@ -0,0 +1,189 @@
+"""Локальная заглушка Telegram Bot API для нагрузочных проверок бота.
+
+Отвечает на getUpdates, sendMessage, editMessageText, editMessageReplyMarkup,
+deleteMessage и answerCallbackQuery так, как этого ждёт TeleBot. Обновления
+от «операторов» ставятся в очередь методами push_message/push_callback, а всё,
+что бот отправил в чат, записывается и доступно через wait_calls/wait_button.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+
+
+class FakeBotApi:
+    """HTTP-сервер Bot API в памяти; latency - задержка каждого ответа, секунд"""
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.calls = Counter()  # Метод -> число вызовов, кроме getUpdates
+        self._updates = []
+        self._next_update_id = 1
+        self._next_message_id = {}  # chat_id -> следующий message_id
+        self._chat_calls = {}  # chat_id -> [(метод, параметры)]
+        self._condition = threading.Condition()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        """Адрес для TELEGRAM_API_URL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-bot-api", daemon=True).start()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- обновления от операторов ---
+
+    def push_message(self, chat_id, text):
+        message = {"message_id": 0, "date": int(time.time()), "text": text,
+                   "chat": {"id": chat_id, "type": "private"},
+                   "from": {"id": chat_id, "is_bot": False, "first_name": f"op{chat_id}"}}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        self._push({"message": message})
+
+    def push_callback(self, chat_id, message_id, data):
+        user = {"id": chat_id, "is_bot": False, "first_name": f"op{chat_id}"}
+        self._push({"callback_query": {
+            "id": str(self._next_update_id), "chat_instance": str(chat_id), "data": data, "from": user,
+            "message": {"message_id": message_id, "date": int(time.time()), "text": "",
+                        "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER},
+        }})
+
+    def _push(self, update):
+        with self._condition:
+            update["update_id"] = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._condition.notify_all()
+
+    # --- ответы бота ---
+
+    def call_count(self, chat_id):
+        with self._condition:
+            return len(self._chat_calls.get(chat_id, ()))
+
+    def wait_calls(self, chat_id, count, timeout=30.0):
+        """Ждёт, пока бот сделает в чате не меньше count вызовов; возвращает их список"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while len(self._chat_calls.get(chat_id, ())) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Чат {chat_id}: нет ответа бота за {timeout} с")
+                self._condition.wait(remaining)
+            return list(self._chat_calls[chat_id])
+
+    def wait_text(self, chat_id, text, since=0, timeout=30.0):
+        """Ждёт сообщения бота с текстом text среди вызовов начиная с номера since"""
+        return self._wait(chat_id, since, timeout, lambda method, params: params.get("text") == text,
+                          f"сообщения {text!r}")
+
+    def wait_button(self, chat_id, label, since=0, timeout=30.0):
+        """Ждёт inline-кнопку label в сообщениях бота начиная с вызова since: (message_id, callback_data)"""
+        def find(method, params):
+            markup = params.get("reply_markup")
+            if not markup:
+                return None
+            for row in json.loads(markup).get("inline_keyboard", ()):
+                for button in row:
+                    if button.get("text") == label:
+                        return int(params["message_id"]), button["callback_data"]
+            return None
+        return self._wait(chat_id, since, timeout, find, f"кнопки {label!r}")
+
+    def _wait(self, chat_id, since, timeout, match, what):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                calls = self._chat_calls.get(chat_id, ())
+                for method, params in reversed(calls[since:]):
+                    found = match(method, params)
+                    if found:
+                        return found
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Чат {chat_id}: нет {what} за {timeout} с")
+                self._condition.wait(remaining)
+
+    # --- HTTP ---
+
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        deadline = time.monotonic() + min(float(params.get("timeout") or 0), 1.0)
+        with self._condition:
+            # Подтверждённые обновления больше не нужны
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._condition.wait(deadline - time.monotonic())
+            return list(self._updates[:100])
+
+    def _record(self, method, params):
+        chat_id = int(params.get("chat_id") or 0)
+        with self._condition:
+            self.calls[method] += 1
+            if method == "sendMessage":
+                message_id = self._next_message_id.get(chat_id, 1)
+                self._next_message_id[chat_id] = message_id + 1
+                params["message_id"] = message_id
+            self._chat_calls.setdefault(chat_id, []).append((method, params))
+            self._condition.notify_all()
+        if method in ("sendMessage", "editMessageText", "editMessageReplyMarkup"):
+            return {"message_id": int(params["message_id"]), "date": int(time.time()), "text": params.get("text", ""),
+                    "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER}
+        return True
+
+    def _handle(self, method, params):
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if self.latency:
+            time.sleep(self.latency)
+        if method == "getMe":
+            return BOT_USER
+        return self._record(method, params)
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._serve()
+
+            def do_POST(self):
+                self._serve()
+
+            def _serve(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length).decode("utf-8")
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update({key: values[0] for key, values in parse_qs(body).items()})
+                result = api._handle(url.path.rsplit("/", 1)[-1], params)
+                body = json.dumps({"ok": True, "result": result}).encode("utf-8")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Бот завершился, не дождавшись ответа
+
+        return Handler
@@ -0,0 +1,139 @@
+"""Воспроизведение записанных обновлений (UPDATES_RECORD_PATH) через диспетчер бота.
+
+Бот запускается целиком (main.py) против заглушки Bot API и таблицы в памяти,
+обновления из записи подаются в main.dispatcher с исходными паузами, ускоренными
+в --speed раз (0 - без пауз). Строки, попавшие в таблицу, можно сохранить
+(--save) и сравнить с сохранёнными раньше (--expected) - например, до и после
+изменения кода или при 1x и 100x.
+
+Запуск: python bench/replay.py data/updates.jsonl.gz --speed 10 --expected rows.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from e2e import start_bot  # noqa: E402
+from fake_sheets import FakeSpreadsheet  # noqa: E402
+from fake_telegram import FakeBotApi  # noqa: E402
+from update_recorder import read_recording  # noqa: E402
+
+
+class RealClock:
+    """Паузы записи, ускоренные в speed раз"""
+
+    def __init__(self, speed):
+        self.speed = speed
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+
+    def wait_until(self, offset):
+        """Ждёт момента offset секунд от начала записи; возвращает опоздание, секунд"""
+        delay = self._started + offset / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return max(0.0, -delay)
+
+
+class VirtualClock:
+    """Без пауз: обновления подаются друг за другом так быстро, как принимает диспетчер"""
+
+    def start(self):
+        pass
+
+    def wait_until(self, offset):
+        return 0.0
+
+
+def replay(bot, recording, clock):
+    """Подаёт обновления записи в диспетчер бота по часам clock; возвращает (число обновлений, макс. опоздание)"""
+    count, lateness, first = 0, 0.0, None
+    clock.start()
+    for at, update in recording:
+        if first is None:
+            first = at
+        lateness = max(lateness, clock.wait_until(at - first))
+        bot.dispatcher.submit(update)
+        count += 1
+    return count, lateness
+
+
+def row_counts(rows):
+    """Строки листов без учёта порядка: {лист: Counter(строка в JSON)}"""
+    return {title: Counter(json.dumps(row, ensure_ascii=False) for row in values) for title, values in rows.items()}
+
+
+def compare_rows(expected, actual):
+    """Различия строк таблицы; пустой список - совпадают"""
+    differences = []
+    expected, actual = row_counts(expected), row_counts(actual)
+    for title in sorted(set(expected) | set(actual)):
+        missing = expected.get(title, Counter()) - actual.get(title, Counter())
+        extra = actual.get(title, Counter()) - expected.get(title, Counter())
+        differences.extend(f"{title}: нет строки {row}" for row in missing.elements())
+        differences.extend(f"{title}: лишняя строка {row}" for row in extra.elements())
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("recording", help="файл записи обновлений (.jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=1, help="ускорение относительно записи; 0 - без пауз")
+    parser.add_argument("--expected", help="JSON со строками таблицы для сравнения")
+    parser.add_argument("--save", help="сохранить получившиеся строки таблицы в JSON")
+    parser.add_argument("--telegram-latency-ms", type=float, default=0, help="задержка ответа Bot API")
+    parser.add_argument("--sheets-latency-ms", type=float, default=0, help="задержка вызова Google Sheets")
+    parser.add_argument("--chat-rate", type=float, default=1000,
+                        help="сообщений в чат в секунду (лимит отправки бота)")
+    args = parser.parse_args()
+    # Бот работает во временном каталоге: пути из командной строки - до смены каталога
+    recording_path = os.path.abspath(args.recording)
+    expected_path = os.path.abspath(args.expected) if args.expected else None
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    api = FakeBotApi(latency=args.telegram_latency_ms / 1000)
+    api.start()
+    spreadsheet = FakeSpreadsheet(latency=args.sheets_latency_ms / 1000)
+    bot = start_bot(api, spreadsheet, args)
+    bot.sheets_connection.wait(30)
+
+    clock = RealClock(args.speed) if args.speed > 0 else VirtualClock()
+    started = time.perf_counter()
+    count, lateness = replay(bot, read_recording(recording_path), clock)
+    bot.dispatcher.join()
+    elapsed = time.perf_counter() - started
+
+    # Строки доходят до таблицы пачками: ждём, пока журнал опустеет
+    deadline = time.monotonic() + 60
+    while bot.outbox.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    rows = spreadsheet.rows()
+
+    print(f"обновлений: {count}, время: {elapsed:.1f} с, в секунду: {count / elapsed:.1f}")
+    print(f"наибольшее опоздание подачи: {lateness * 1000:.0f} мс")
+    print(f"строк в таблице: {sum(len(values) for values in rows.values())}, "
+          f"в журнале не доставлено: {bot.outbox.pending_count()}")
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+    if expected_path:
+        with open(expected_path, encoding="utf-8") as f:
+            differences = compare_rows(json.load(f), rows)
+        for difference in differences[:20]:
+            print(difference)
+        if differences:
+            print(f"строки таблицы отличаются: {len(differences)}")
+            return 1
+        print("строки таблицы совпадают")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
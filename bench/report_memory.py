@@ -0,0 +1,69 @@
+"""Сравнение памяти на одну сессию: вложенные словари строк против модели Report.
+
+Запуск: python bench/report_memory.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import Debt, FuelBlock, Report  # noqa: E402
+
+
+def deep_size(obj, seen=None):
+    """Размер объекта в байтах вместе со всем, на что он ссылается"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, name), seen) for name in obj.__slots__)
+    return size
+
+
+def dict_session(seed):
+    # Так сессия хранилась раньше: все числа - строки из сообщений
+    def fuel(offset):
+        return {
+            'counter': str(100000 + seed + offset),
+            'sold_cash': str(1200 + seed),
+            'sold_card': str(800 + seed),
+            'total_sold': 2000 + 2 * seed,
+            'debtors': [{"contractor": "Контрагент 1", "volume": str(50 + seed)},
+                        {"contractor": "Контрагент 2", "volume": str(30 + seed)}],
+        }
+    return {
+        'state': 'creating_report',
+        'date': f"{seed % 28 + 1:02d}.03.2026",
+        'operator': 'Оператор 1',
+        'temperature': str(seed % 30 - 10),
+        'comments': 'Без комментариев',
+        'fuel_ai92': fuel(1),
+        'fuel_dt': fuel(2),
+    }
+
+
+def report_session(seed):
+    def fuel(offset):
+        block = FuelBlock(counter=100000 + seed + offset, sold_cash=1200 + seed, sold_card=800 + seed,
+                          debtors=[Debt("Контрагент 1", 50 + seed), Debt("Контрагент 2", 30 + seed)])
+        block.recalculate_total()
+        return block
+    return Report('creating_report', f"{seed % 28 + 1:02d}.03.2026", 'Оператор 1', float(seed % 30 - 10),
+                  'Без комментариев', fuel(1), fuel(2))
+
+
+def main(sessions=10000):
+    before = sum(deep_size(dict_session(seed)) for seed in range(sessions)) / sessions
+    after = sum(deep_size(report_session(seed)) for seed in range(sessions)) / sessions
+    print(f"dict: {before:.0f} байт на сессию")
+    print(f"Report: {after:.0f} байт на сессию ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Сравнение выбора обработчика кнопки: цепочка лямбда-предикатов против таблицы Router.
+
+Запуск: python bench/router_dispatch.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import Router  # noqa: E402
+
+# Кнопки бота в том порядке, в каком раньше регистрировались обработчики
+BUTTONS = [
+    (["Оператор 1", "Оператор 2", "Оператор 3", "Другой"], None),
+    (["Добавить Комментарии", "Нет Комментариев"], None),
+    (["Всё верно, сохранить данные", "Нужно изменить данные"], 'general'),
+    (["Дата", "Оператор", "Температура", "Комментарий", "Ничего менять не нужно"], None),
+    (["Сумма АИ-92-К5 за день верна", "Нужно ввести другую сумму АИ-92-К5"], None),
+    (["Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно"], 'ai92'),
+    (["Всё верно, сохранить данные", "Нужно изменить данные"], 'ai92'),
+    (["Сумма ДТ-К5 за день верна", "Нужно ввести другую сумму ДТ-К5"], None),
+    (["Всё верно, сохранить данные", "Нужно изменить данные"], 'dt'),
+    (["Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно"], 'dt'),
+]
+
+
+class Message:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+def predicate_chain():
+    # Так обработчики выбирались раньше: первый подошедший предикат по порядку
+    return [((lambda texts: lambda message: message.text in texts)(texts), index)
+            for index, (texts, stage) in enumerate(BUTTONS)]
+
+
+def linear(chain, message):
+    for predicate, handler in chain:
+        if predicate(message):
+            return handler
+    return None
+
+
+def measure(func, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for stage, message in messages:
+            func(stage, message)
+    return (time.perf_counter() - start) / (rounds * len(messages)) * 1e9
+
+
+def main(rounds=20000):
+    chain = predicate_chain()
+    router = Router()
+    for index, (texts, stage) in enumerate(BUTTONS):
+        router.route(texts, stage=stage)(index)
+
+    messages = [(stage, Message(text)) for texts, stage in BUTTONS for text in texts]
+    messages.append(('dt', Message("произвольный текст")))
+
+    before = measure(lambda stage, message: linear(chain, message), messages, rounds)
+    after = measure(lambda stage, message: router.resolve(stage, message.text), messages, rounds)
+    print(f"предикаты: {before:.0f} нс на обновление")
+    print(f"Router: {after:.0f} нс на обновление ({after / before:.0%})")
+
+    # Цепочка не различает одинаковые кнопки разных разделов отчёта
+    wrong = sum(1 for stage, message in messages
+                if linear(chain, message) != router.resolve(stage, message.text))
+    print(f"кнопок, ушедших не в тот раздел при переборе: {wrong}")
+
+
+if __name__ == "__main__":
+    main()
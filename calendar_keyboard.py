@@ -0,0 +1,119 @@
+import locale
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# callback_data календаря: "c1:m:<год>:<месяц>" - показать месяц,
+# "c1:d:<год>:<месяц>:<день>" - выбрать дату, "c1:i" - кнопка без действия.
+# Номер версии в префиксе позволяет менять схему, не ломая старые сообщения.
+CALLBACK_PREFIX = "c1"
+CALLBACK_IGNORE = f"{CALLBACK_PREFIX}:i"
+
+
+def month_callback(year, month):
+    return f"{CALLBACK_PREFIX}:m:{year}:{month}"
+
+
+def date_callback(year, month, day):
+    return f"{CALLBACK_PREFIX}:d:{year}:{month}:{day}"
+
+
+def shift_month(year, month, delta):
+    index = year * 12 + month - 1 + delta
+    return index // 12, index % 12 + 1
+
+
+def parse_callback(data):
+    """Разбирает callback_data календаря: ("ignore",), ("month", год, месяц) или
+    ("date", год, месяц, день); None, если кнопка не из календаря.
+
+    Понимает и прежний формат (prev_month_/next_month_/select_date_/ignore)
+    кнопок, отправленных до перехода на новую схему.
+    """
+    try:
+        if data.startswith(CALLBACK_PREFIX + ":"):
+            parts = data.split(":")
+            if parts[1] == "i":
+                return ("ignore",)
+            if parts[1] == "m":
+                return ("month", int(parts[2]), int(parts[3]))
+            if parts[1] == "d":
+                return ("date", int(parts[2]), int(parts[3]), int(parts[4]))
+            return None
+        if data == "ignore":
+            return ("ignore",)
+        parts = data.split("_")
+        if data.startswith("prev_month_"):
+            return ("month", *shift_month(int(parts[2]), int(parts[3]), -1))
+        if data.startswith("next_month_"):
+            return ("month", *shift_month(int(parts[2]), int(parts[3]), 1))
+        if data.startswith("select_date_"):
+            return ("date", int(parts[2]), int(parts[3]), int(parts[4]))
+    except (IndexError, ValueError):
+        return None
+    return None
+
+
+def build_calendar(year, month):
+    markup = InlineKeyboardMarkup()
+    # Название месяца и навигация
+    row = [
+        InlineKeyboardButton("⬅️", callback_data=month_callback(*shift_month(year, month, -1))),
+        InlineKeyboardButton(f"{datetime(year, month, 1):%B %Y}", callback_data=CALLBACK_IGNORE),
+        InlineKeyboardButton("➡️", callback_data=month_callback(*shift_month(year, month, 1)))
+    ]
+    markup.row(*row)
+
+    # Дни недели
+    days = ["", "", "", "", "", "", ""]
+    markup.row(*[InlineKeyboardButton(day, callback_data=CALLBACK_IGNORE) for day in days])
+
+    # Дни месяца
+    first_day = datetime(year, month, 1)
+    last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    calendar_days = ["" for _ in range(first_day.weekday())]  # Пустые кнопки до первого дня месяца
+    calendar_days += [str(day) for day in range(1, last_day.day + 1)]
+
+    for week in range(0, len(calendar_days), 7):
+        row = [
+            InlineKeyboardButton(day, callback_data=date_callback(year, month, day))
+            if day else InlineKeyboardButton(" ", callback_data=CALLBACK_IGNORE)
+            for day in calendar_days[week:week + 7]
+        ]
+        markup.row(*row)
+    return markup
+
+
+class CalendarCache:
+    """LRU готовых календарей в виде JSON по ключу (год, месяц, локаль).
+
+    TeleBot передаёт строку reply_markup как есть, поэтому при листании
+    месяцев не создаются кнопки и не кодируется JSON.
+    """
+
+    def __init__(self, max_size=24):
+        self.max_size = max_size
+        self._markups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, year, month):
+        # Название месяца зависит от локали LC_TIME, поэтому она входит в ключ
+        key = (year, month, locale.setlocale(locale.LC_TIME))
+        with self._lock:
+            markup = self._markups.get(key)
+            if markup is not None:
+                self._markups.move_to_end(key)
+                return markup
+        markup = build_calendar(year, month).to_json()
+        with self._lock:
+            self._markups[key] = markup
+            while len(self._markups) > self.max_size:
+                self._markups.popitem(last=False)
+        return markup
+
+    def warm(self, today):
+        """Заранее строит текущий и соседние месяцы"""
+        for delta in (-1, 0, 1):
+            self.get(*shift_month(today.year, today.month, delta))
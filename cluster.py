@@ -0,0 +1,289 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from telebot import types
+
+from dispatcher import update_chat_id, update_json
+
+
+def partition_of(chat_id, partitions):
+    """Раздел чата: обновления одного чата всегда обрабатывает одна реплика"""
+    return 0 if chat_id is None else chat_id % partitions
+
+
+class FileLock:
+    """Неблокирующая блокировка файла (flock): ОС снимает её сама, если процесс-владелец завершился"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class LeaderElection:
+    """Выбор ведущей реплики: ею становится процесс, захвативший файл-блокировку.
+
+    Ведущая принимает обновления от Telegram и единственная пишет в Google Sheets.
+    Если она завершится, блокировку в течение interval секунд захватит другая реплика.
+    """
+
+    def __init__(self, path, on_elected, interval=1.0):
+        self.lock = FileLock(path)
+        self.on_elected = on_elected
+        self.interval = interval
+        self.is_leader = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="leader-election", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self.lock.acquire():
+            time.sleep(self.interval)
+        print(f"Реплика {os.getpid()} стала ведущей")
+        self.is_leader.set()
+        self.on_elected()
+
+
+class UpdateSpool:
+    """Общая очередь обновлений (SQLite) между ведущей репликой и обработчиками разделов.
+
+    submit() совпадает по смыслу с ChatDispatcher.submit, поэтому приём обновлений
+    (polling, webhook, async) пишет в очередь без изменений. Обновление с update_id,
+    виденным за последние seen_ttl секунд, не ставится повторно - например, после
+    смены ведущей. Сравнивать с последним update_id нельзя: после недели без
+    обновлений Telegram начинает нумерацию заново со случайного числа.
+    take() не удаляет обновления, а помечает взявшей репликой; удаляет их done()
+    после обработки. Пометки реплики, завершившейся посреди пачки, снимает
+    reclaim() - обновления обработает новый хозяин раздела.
+    """
+
+    def __init__(self, path, partitions, seen_ttl=24 * 3600, prune_interval=600):
+        self.partitions = partitions
+        self.seen_ttl = seen_ttl  # Telegram хранит неподтверждённые обновления сутки
+        self.prune_interval = prune_interval
+        self._pruned_at = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Транзакции открываются явно: take() должен забрать обновления атомарно между процессами
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS updates ("
+                " update_id INTEGER PRIMARY KEY,"
+                " partition INTEGER NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " received_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS updates_partition ON updates (partition, update_id)")
+            columns = {column[1] for column in self._conn.execute("PRAGMA table_info(updates)")}
+            for column, kind in (("claimed_by", "INTEGER"), ("claimed_at", "REAL")):
+                if column not in columns:  # Очереди старых версий дополняются
+                    try:
+                        self._conn.execute(f"ALTER TABLE updates ADD COLUMN {column} {kind}")
+                    except sqlite3.OperationalError:
+                        pass  # Столбец только что добавила другая реплика
+            # Недавно принятые update_id: обработанные обновления из updates уже удалены
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen (update_id INTEGER PRIMARY KEY, seen_at REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS seen_time ON seen (seen_at)")
+
+    def submit(self, update):
+        partition = partition_of(update_chat_id(update), self.partitions)
+        payload = json.dumps(update_json(update), ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if now - self._pruned_at >= self.prune_interval:
+                    self._conn.execute("DELETE FROM seen WHERE seen_at < ?", (now - self.seen_ttl,))
+                    self._pruned_at = now
+                cursor = self._conn.execute("INSERT OR IGNORE INTO seen (update_id, seen_at) VALUES (?, ?)",
+                                            (update.update_id, now))
+                if cursor.rowcount:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO updates (update_id, partition, payload, received_at) VALUES (?, ?, ?, ?)",
+                        (update.update_id, partition, payload, now),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def take(self, partitions, replica, limit=100):
+        """Помечает за репликой и возвращает невзятые обновления указанных разделов в порядке приёма"""
+        if not partitions:
+            return []
+        placeholders = ",".join("?" * len(partitions))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT update_id, payload FROM updates WHERE partition IN ({placeholders})"
+                    # По времени приёма: после сброса нумерации Telegram новые update_id меньше старых
+                    " AND claimed_by IS NULL ORDER BY received_at, update_id LIMIT ?", (*partitions, limit),
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE updates SET claimed_by = ?, claimed_at = ?"
+                        f" WHERE update_id IN ({','.join('?' * len(rows))})",
+                        [replica, time.time(), *[update_id for update_id, _ in rows]],
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [types.Update.de_json(payload) for _, payload in rows]
+
+    def done(self, update_id):
+        """Удаляет обработанное обновление из очереди"""
+        with self._lock:
+            self._conn.execute("DELETE FROM updates WHERE update_id = ?", (update_id,))
+
+    def reclaim(self, partition):
+        """Снимает пометки с обновлений раздела: их взяла реплика, завершившаяся до обработки.
+
+        Вызывается новым хозяином раздела сразу после захвата блокировки: прежний
+        хозяин либо завершился, либо перед передачей раздела дождался обработки
+        всех взятых обновлений. Обновление, обработанное, но не удалённое до
+        сбоя, будет обработано повторно.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE updates SET claimed_by = NULL, claimed_at = NULL WHERE partition = ? AND claimed_by IS NOT NULL",
+                (partition,),
+            )
+        if cursor.rowcount:
+            print(f"Раздел {partition}: {cursor.rowcount} взятых, но не обработанных обновлений возвращены в очередь")
+
+    def backlog(self):
+        """Необработанные обновления по разделам: {раздел: число}"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT partition, COUNT(*) FROM updates GROUP BY partition").fetchall())
+
+
+class ClusterMember:
+    """Реплика бота: берёт из общей очереди обновления своих разделов и отдаёт их диспетчеру.
+
+    Разделов столько же, сколько реплик, у каждого - файл-блокировка в directory.
+    Реплика держит раздел со своим номером, а раздел завершившейся реплики
+    подхватывает, пока та не вернётся: вернувшаяся реплика оставляет файл .want,
+    и временный хозяин отдаёт раздел, доработав уже взятые обновления.
+    Сессии чатов полученного раздела при этом перечитываются из общей базы.
+    Обновление удаляется из очереди только после обработки (dispatcher.on_done).
+    """
+
+    def __init__(self, spool, dispatcher, directory, replica, replicas, sessions, poll_interval=0.1,
+                 rebalance_interval=5.0, batch_size=100):
+        if not 0 <= replica < replicas:
+            raise ValueError(f"Номер реплики {replica} вне диапазона 0..{replicas - 1}")
+        os.makedirs(directory, exist_ok=True)
+        self.spool = spool
+        self.dispatcher = dispatcher
+        dispatcher.on_done = lambda update: spool.done(update.update_id)
+        self.directory = directory
+        self.replica = replica
+        self.sessions = sessions
+        self.poll_interval = poll_interval
+        self.rebalance_interval = rebalance_interval
+        self.batch_size = batch_size
+        self.locks = [FileLock(os.path.join(directory, f"partition-{partition}.lock"))
+                      for partition in range(replicas)]
+
+    def owned(self):
+        return [partition for partition, lock in enumerate(self.locks) if lock.held]
+
+    def run(self):
+        next_rebalance = 0.0
+        while True:
+            if time.monotonic() >= next_rebalance:
+                self.rebalance()
+                next_rebalance = time.monotonic() + self.rebalance_interval
+            try:
+                updates = self.spool.take(self.owned(), self.replica, self.batch_size)
+            except sqlite3.Error as e:
+                print(f"Ошибка чтения очереди обновлений: {e}")
+                updates = []
+            for update in updates:
+                self.dispatcher.submit(update)
+            if not updates:
+                time.sleep(self.poll_interval)
+
+    def rebalance(self):
+        own = self.locks[self.replica]
+        if not own.held:
+            if own.acquire():
+                self._clear_want(self.replica)
+                self.spool.reclaim(self.replica)
+                self._drop_sessions(self.replica)
+                print(f"Реплика {self.replica} обрабатывает свой раздел")
+            else:
+                self._touch_want(self.replica)  # Раздел у временного хозяина - просим вернуть
+        for partition, lock in enumerate(self.locks):
+            if partition == self.replica:
+                continue
+            if lock.held:
+                if self._wanted(partition):
+                    self.dispatcher.join()  # Взятые обновления раздела дорабатываются здесь, по порядку
+                    lock.release()
+                    print(f"Раздел {partition} возвращён реплике {partition}")
+            elif not self._wanted(partition) and lock.acquire():
+                self.spool.reclaim(partition)
+                self._drop_sessions(partition)
+                print(f"Раздел {partition} без реплики, его обрабатывает реплика {self.replica}")
+
+    def _drop_sessions(self, partition):
+        """Забывает сессии чатов полученного раздела: их меняла другая реплика.
+
+        Сессии остальных разделов не трогаются - их обработчики могут держать
+        данные сессии посреди обновления, и сохранение после сброса их потеряло бы.
+        """
+        self.dispatcher.join()  # Переданные диспетчеру обновления дорабатываются до сброса
+        self.sessions.drop_cache(lambda chat_id: partition_of(chat_id, len(self.locks)) == partition)
+
+    def _want_path(self, partition):
+        return os.path.join(self.directory, f"partition-{partition}.want")
+
+    def _touch_want(self, partition):
+        with open(self._want_path(partition), "w"):
+            pass
+
+    def _clear_want(self, partition):
+        try:
+            os.remove(self._want_path(partition))
+        except FileNotFoundError:
+            pass
+
+    def _wanted(self, partition):
+        # Реплика, ждущая свой раздел, обновляет файл каждые rebalance_interval секунд
+        try:
+            return time.time() - os.path.getmtime(self._want_path(partition)) < 3 * self.rebalance_interval
+        except FileNotFoundError:
+            return False
@@ -1 +1,86 @@
-BOT_TOKEN = 'your token'
\ No newline at end of file
+import os
+
+BOT_TOKEN = 'your token'
+TELEGRAM_API_URL = ""  # другой адрес Bot API, например локальная заглушка для нагрузочных проверок
+
+# Запись входящих обновлений для воспроизведения (bench/replay.py); пустой путь - не записывать
+UPDATES_RECORD_PATH = ""  # например "data/updates.jsonl.gz"
+
+# Метрики: длительности обработчиков и вызовов API, сессии, очереди
+METRICS_PORT = 0  # порт страницы Prometheus /metrics (у реплики - METRICS_PORT + номер); 0 - не запускать
+METRICS_HOST = "127.0.0.1"
+METRICS_SNAPSHOT_PATH = ""  # JSON-снимок, например "data/metrics-{replica}.json"; пустой - не писать
+METRICS_SNAPSHOT_INTERVAL = 60  # секунд между снимками
+
+# Пакетная запись отчётов в Google Sheets
+SHEETS_BATCH_SIZE = 20  # строк в одной пачке
+SHEETS_FLUSH_INTERVAL = 5  # секунд до принудительной записи
+SHEETS_RETRY_BASE = 2  # секунд до первой повторной попытки, дальше задержка удваивается
+SHEETS_RETRY_MAX = 300  # максимальная задержка между попытками, секунд
+
+# Локальный журнал отчётов, ещё не записанных в таблицу
+OUTBOX_PATH = "data/outbox.sqlite3"
+
+# Реестр станций: чаты, листы и списки операторов и контрагентов (см. stations.py)
+STATIONS_PATH = "stations.json"
+
+# Локальная копия листа отчётов для чтения без запросов к Google
+REPLICA_PATH = "data/replica.sqlite3"
+REPLICA_SYNC_INTERVAL = 300  # секунд между дочитываниями хвоста листа
+
+# Нарастающие итоги долгов контрагентов для команды /debts
+DEBTS_PATH = "data/debts.sqlite3"
+
+# Лист сводки с итогами по дням и месяцам для команды /month и руководства
+SUMMARY_WORKSHEET = "Сводка"
+SUMMARY_FLUSH_INTERVAL = 60  # секунд между записями изменившихся итогов
+
+# Сверка разницы показаний счётчика с проданными литрами
+COUNTER_TOLERANCE = 1  # литров допустимого расхождения
+
+# Квота Google Sheets API и отключение при сбоях
+SHEETS_REQUESTS_PER_MINUTE = 60  # запросов в минуту на пользователя
+SHEETS_BURST_SECONDS = 5  # запросов подряд без ожидания - квота за столько секунд
+SHEETS_FAILURE_THRESHOLD = 5  # ошибок подряд до отключения
+SHEETS_COOLDOWN = 60  # секунд паузы перед пробным запросом
+SHEETS_CACHE_PATH = "data/sheets.json"  # ключ таблицы и id листа, найденные по имени
+SHEETS_POOL_SIZE = 10  # keep-alive соединений к Google API
+SHEETS_TOKEN_REFRESH_MARGIN = 300  # секунд до истечения токена, когда он обновляется в фоне
+
+# Несколько реплик бота на одной машине: общие сессии и журнал в SQLite, чаты делятся между
+# репликами по chat_id, ведущая (файл-блокировка) принимает обновления и пишет в Google Sheets
+CLUSTER_REPLICAS = 1  # 1 - обычный режим одного процесса
+CLUSTER_REPLICA = int(os.environ.get("BOT_REPLICA", "0"))  # номер этой реплики, 0..CLUSTER_REPLICAS-1
+CLUSTER_DIR = "data/cluster"  # файлы-блокировки и очередь обновлений
+
+# Режим работы: "polling" - синхронный TeleBot, "async" - приём обновлений через AsyncTeleBot,
+# "webhook" - встроенный HTTP-сервер принимает обновления от Telegram
+RUNTIME_MODE = "polling"
+WORKERS = 8  # потоков обработки; обновления одного чата всегда идут в один поток
+ASYNC_POOL_SIZE = 50  # соединений aiohttp с Telegram
+
+# Режим webhook
+WEBHOOK_URL = ""  # внешний адрес сервера, например "https://bot.example.com"; пустой - setWebhook не вызывается
+WEBHOOK_SECRET = ""  # секрет из заголовка X-Telegram-Bot-Api-Secret-Token, обязателен
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "/webhook"
+
+# Сессии чатов (незаконченные отчёты и ожидаемый шаг диалога)
+SESSION_BACKEND = "sqlite"  # "sqlite" - переживают перезапуск, "memory" - только в памяти
+SESSION_PATH = "data/sessions.sqlite3"
+SESSION_TTL = 12 * 3600  # секунд простоя до удаления сессии
+SESSION_CACHE_SIZE = 1000  # сессий в памяти
+
+# Календарь выбора даты
+CALENDAR_CACHE_SIZE = 24  # месяцев с готовой клавиатурой в памяти
+
+# Режим мастера: отчёт ведётся в одном редактируемом сообщении с inline-кнопками
+WIZARD_MODE = False  # один вызов Telegram на шаг: полный отчёт - 23 вызова вместо 26
+WIZARD_REPLY_TIMEOUT = 10  # секунд ждать ответа Telegram на шаг мастера, дальше поток чата не держится
+
+# Лимиты исходящих сообщений Telegram
+TELEGRAM_MESSAGES_PER_SECOND = 30  # на всего бота
+TELEGRAM_CHAT_MESSAGES_PER_SECOND = 1  # в один чат в среднем
+TELEGRAM_CHAT_BURST = 5  # сообщений в чат подряд без ожидания
+TELEGRAM_SEND_WORKERS = 4  # потоков отправки
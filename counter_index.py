@@ -0,0 +1,79 @@
+import bisect
+import threading
+
+from replica import day_key
+from report import FUEL_NAMES, Report
+
+
+class CounterIndex:
+    """Показания счётчиков по станции и виду топлива в памяти: сверка отчёта без чтения таблицы.
+
+    Заполняется из локального журнала (catch_up): при старте целиком, затем
+    дочитываются только новые записи. Для каждой станции и топлива хранятся
+    показания по датам, поэтому отчёт задним числом сверяется с предыдущей
+    датой, а не с последней сохранённой.
+    """
+
+    def __init__(self):
+        self._days = {}  # (станция, топливо) -> отсортированные даты "гггг-мм-дд"
+        self._readings = {}  # (станция, топливо, дата) -> показание
+        self.last_entry = 0
+        self._lock = threading.Lock()
+
+    def catch_up(self, outbox):
+        while True:
+            entries = outbox.entries_after(self.last_entry)
+            if not entries:
+                return
+            for entry_id, station, row in entries:
+                if station is not None:
+                    self.add(station, row)
+                # Прогрев при старте и обработчики могут дочитывать журнал одновременно
+                self.last_entry = max(self.last_entry, entry_id)
+
+    def add(self, station, row):
+        report = Report.from_row(row)
+        day = day_key(report.date)
+        if day is None:
+            return
+        with self._lock:
+            for fuel, block in (("ai92", report.fuel_ai92), ("dt", report.fuel_dt)):
+                if not isinstance(block.counter, (int, float)):
+                    continue  # Строки, записанные до появления столбцов счётчиков
+                key = (str(station), fuel)
+                days = self._days.setdefault(key, [])
+                if (*key, day) not in self._readings:
+                    bisect.insort(days, day)
+                self._readings[(*key, day)] = block.counter
+
+    def previous(self, station, fuel, date):
+        """Последнее показание до даты "дд.мм.гггг": (дата "гггг-мм-дд", показание) или None"""
+        day = day_key(date)
+        key = (str(station), fuel)
+        with self._lock:
+            days = self._days.get(key)
+            if day is None or not days:
+                return None
+            position = bisect.bisect_left(days, day)
+            if position == 0:
+                return None
+            previous_day = days[position - 1]
+            return previous_day, self._readings[(*key, previous_day)]
+
+    def check(self, station, fuel, date, block, tolerance=0):
+        """Предупреждение, если разница показаний не сходится с проданными литрами; None - всё сходится"""
+        if block.counter is None or block.total_sold is None:
+            return None
+        previous = self.previous(station, fuel, date)
+        if previous is None:
+            return None
+        previous_day, previous_counter = previous
+        since = f"{previous_day[8:10]}.{previous_day[5:7]}.{previous_day[:4]}"
+        delta = block.counter - previous_counter
+        if delta < 0:
+            return (f"Показания счётчика {FUEL_NAMES[fuel]} ({block.counter:g}) меньше, "
+                    f"чем {since} ({previous_counter:g}).")
+        if abs(delta - block.total_sold) > tolerance:
+            return (f"По счётчику {FUEL_NAMES[fuel]} с {since} отпущено {delta:g} л., "
+                    f"а продано {block.total_sold:g} л.")
+        return None
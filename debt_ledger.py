@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import threading
+
+from report import Report
+
+
+class DebtLedger:
+    """Нарастающие итоги долгов по контрагенту и виду топлива (SQLite).
+
+    Записи журнала учитываются строго по возрастанию номера, поэтому одна
+    запись не учитывается дважды, а не учтённые до сбоя досчитываются из
+    журнала при старте (catch_up).
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS debts ("
+                " contractor TEXT NOT NULL,"
+                " fuel TEXT NOT NULL,"
+                " volume REAL NOT NULL,"
+                " reports INTEGER NOT NULL,"
+                " PRIMARY KEY (contractor, fuel))"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+    @property
+    def last_entry(self):
+        """Номер последней учтённой записи журнала"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_entry'").fetchone()
+        return row[0] if row else 0
+
+    def record(self, entry_id, row):
+        """Добавляет долги из строки отчёта; запись с уже учтённым номером пропускается"""
+        report = Report.from_row(row)
+        with self._lock, self._conn:
+            # Журнал и итоги могут быть общими у нескольких процессов: проверка и запись - одна транзакция
+            self._conn.execute("BEGIN IMMEDIATE")
+            last = self._conn.execute("SELECT value FROM meta WHERE key = 'last_entry'").fetchone()
+            if last is not None and entry_id <= last[0]:
+                return
+            for fuel, block in (("ai92", report.fuel_ai92), ("dt", report.fuel_dt)):
+                for debtor in block.debtors:
+                    if not debtor.volume:  # "Нет - 0 л." - долга не было
+                        continue
+                    self._conn.execute(
+                        "INSERT INTO debts (contractor, fuel, volume, reports) VALUES (?, ?, ?, 1)"
+                        " ON CONFLICT (contractor, fuel) DO UPDATE SET"
+                        " volume = volume + excluded.volume, reports = reports + 1",
+                        (debtor.contractor, fuel, debtor.volume),
+                    )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_entry', ?)", (entry_id,))
+
+    def catch_up(self, outbox):
+        """Учитывает записи журнала, сохранённые после last_entry"""
+        while True:
+            entries = outbox.entries_after(self.last_entry)
+            if not entries:
+                return
+            for entry_id, _, row in entries:
+                self.record(entry_id, row)
+
+    def totals(self):
+        """Итоги по контрагентам: [(контрагент, {топливо: литры})]"""
+        with self._lock:
+            rows = self._conn.execute("SELECT contractor, fuel, volume FROM debts ORDER BY contractor, fuel").fetchall()
+        totals = {}
+        for contractor, fuel, volume in rows:
+            totals.setdefault(contractor, {})[fuel] = int(volume) if float(volume).is_integer() else volume
+        return list(totals.items())
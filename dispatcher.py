@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+
+
+def update_chat_id(update):
+    """chat_id, к которому относится обновление (None, если чата нет)"""
+    if update.message is not None:
+        return update.message.chat.id
+    if update.callback_query is not None and update.callback_query.message is not None:
+        return update.callback_query.message.chat.id
+    return None
+
+
+def update_json(update):
+    """Обновление обратно в JSON Bot API (для журнала и передачи между процессами)"""
+    data = {"update_id": update.update_id}
+    for name, value in vars(update).items():
+        if hasattr(value, "json"):
+            data[name] = value.json
+    return data
+
+
+class ChatDispatcher:
+    """Пул потоков, в котором обновления одного чата всегда попадают в один и тот же поток.
+
+    Так обновления чата обрабатываются строго по порядку (register_next_step_handler
+    и user_data не гоняются между потоками), а разные чаты идут параллельно.
+    on_done(update) вызывается после обработки каждого обновления, даже неудачной.
+    """
+
+    def __init__(self, process, workers=8, on_done=None):
+        self.process = process
+        self.on_done = on_done
+        self._shards = [queue.Queue() for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._work, args=(shard,), name=f"dispatcher-{index}", daemon=True)
+            for index, shard in enumerate(self._shards)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def shard_of(self, chat_id):
+        return hash(chat_id) % len(self._shards)
+
+    def submit(self, update):
+        """Ставит обновление в очередь потока его чата, не дожидаясь обработки"""
+        self._shards[self.shard_of(update_chat_id(update))].put(update)
+
+    def backlog(self):
+        """Число необработанных обновлений в каждом потоке"""
+        return [shard.qsize() for shard in self._shards]
+
+    def join(self):
+        """Ждёт, пока будут обработаны все поставленные обновления"""
+        for shard in self._shards:
+            shard.join()
+
+    def _work(self, shard):
+        while True:
+            update = shard.get()
+            try:
+                self.process([update])
+            except Exception as e:
+                print(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                if self.on_done is not None:
+                    try:
+                        self.on_done(update)
+                    except Exception as e:
+                        print(f"Ошибка завершения обновления {update.update_id}: {e}")
+                shard.task_done()  # После on_done: join() гарантирует, что оно вызвано
+
+
+def poll_updates(bot, dispatcher, long_polling_timeout=20):
+    """Long polling: полученные обновления раздаются потокам диспетчера"""
+    offset = None
+    while True:
+        try:
+            updates = bot.get_updates(offset=offset, timeout=long_polling_timeout + 10,
+                                      long_polling_timeout=long_polling_timeout)
+        except Exception as e:
+            print(f"Ошибка получения обновлений: {e}")
+            time.sleep(3)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            dispatcher.submit(update)
@@ -1,13 +1,92 @@
+import asyncio
+import functools
+import os
+import threading
+import time
 import telebot
+from telebot import apihelper, asyncio_helper
 from telebot.types import InlineKeyboardMarkup, ReplyKeyboardMarkup, InlineKeyboardButton, KeyboardButton
-from datetime import datetime, timedelta
+from datetime import datetime
 import gspread
-from config import BOT_TOKEN
-from oauth2client.service_account import ServiceAccountCredentials
+from config import (BOT_TOKEN, SHEETS_BATCH_SIZE, SHEETS_FLUSH_INTERVAL, OUTBOX_PATH,
+                    SHEETS_RETRY_BASE, SHEETS_RETRY_MAX, SHEETS_REQUESTS_PER_MINUTE, SHEETS_BURST_SECONDS,
+                    SHEETS_FAILURE_THRESHOLD, SHEETS_COOLDOWN, SHEETS_CACHE_PATH, SHEETS_POOL_SIZE,
+                    SHEETS_TOKEN_REFRESH_MARGIN, REPLICA_PATH, REPLICA_SYNC_INTERVAL, DEBTS_PATH, SUMMARY_WORKSHEET,
+                    SUMMARY_FLUSH_INTERVAL, COUNTER_TOLERANCE, STATIONS_PATH,
+                    RUNTIME_MODE, WORKERS,
+                    ASYNC_POOL_SIZE, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+                    WEBHOOK_PATH, SESSION_BACKEND, SESSION_PATH, SESSION_TTL, SESSION_CACHE_SIZE,
+                    CALENDAR_CACHE_SIZE, WIZARD_MODE, WIZARD_REPLY_TIMEOUT, TELEGRAM_MESSAGES_PER_SECOND,
+                    TELEGRAM_CHAT_MESSAGES_PER_SECOND, TELEGRAM_CHAT_BURST, TELEGRAM_SEND_WORKERS,
+                    TELEGRAM_API_URL, CLUSTER_REPLICAS, CLUSTER_REPLICA, CLUSTER_DIR, UPDATES_RECORD_PATH,
+                    METRICS_PORT, METRICS_HOST, METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL)
+from async_runtime import AsyncRuntime
+from calendar_keyboard import CalendarCache, parse_callback
+from cluster import ClusterMember, LeaderElection, UpdateSpool
+from counter_index import CounterIndex
+from debt_ledger import DebtLedger
+from dispatcher import ChatDispatcher, poll_updates, update_chat_id
+from google.oauth2 import service_account
+from metrics import Histograms, MetricsRegistry, MetricsServer, SnapshotWriter
+from outbox import Outbox
+from replica import ReplicaSync, ReportReplica
+from report import FUEL_NAMES, Debt, FuelBlock, Report
+from report_index import CONFLICT, DUPLICATE, ReportIndex, report_key
+from rollup import RollupWriter, Rollups
+from router import Router
+from send_queue import SendQueue
+from session_store import MemorySessionStore, SqliteSessionStore, SessionStepBackend
+from sheets_connection import SheetsConnection, WorksheetPool
+from sheets_scheduler import SheetsScheduler
+from sheets_session import SheetsSession
+from sheets_writer import SheetsWriter
+from stations import StationRegistry
+from update_recorder import UpdateRecorder
+from webhook import WebhookServer
+from wizard import Wizard
 
 # Telegram bot token
 TOKEN = BOT_TOKEN
-bot = telebot.TeleBot(TOKEN)
+
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL + "/bot{0}/{1}"
+    asyncio_helper.API_URL = TELEGRAM_API_URL + "/bot{0}/{1}"
+
+if CLUSTER_REPLICAS > 1 and SESSION_BACKEND != "sqlite":
+    raise ValueError("Реплики делят сессии через SQLite: нужен SESSION_BACKEND = \"sqlite\"")
+
+# Сессии чатов: данные отчёта и ожидаемый шаг диалога
+if SESSION_BACKEND == "sqlite":
+    user_data = SqliteSessionStore(SESSION_PATH, ttl=SESSION_TTL, max_size=SESSION_CACHE_SIZE,
+                                   encode=Report.to_dict, decode=Report.from_dict)
+else:
+    user_data = MemorySessionStore(ttl=SESSION_TTL, max_size=SESSION_CACHE_SIZE)
+user_data.start_eviction()
+
+# Длительность каждого обработчика по имени функции: команды, шаги get_*/update_*, кнопки
+handler_latency = Histograms()
+
+def timed(handler, *args, **kwargs):
+    started = time.monotonic()
+    try:
+        return handler(*args, **kwargs)
+    finally:
+        handler_latency.observe(handler.__name__, time.monotonic() - started)
+
+def step_handler(name):
+    """next-step обработчик по имени функции, с замером длительности"""
+    handler = globals().get(name)
+    return functools.partial(timed, handler) if handler is not None else None
+
+# Обработчики выполняются в потоках ChatDispatcher, а не в пуле TeleBot;
+# next-step обработчики хранятся в сессии по имени функции
+bot = telebot.TeleBot(TOKEN, threaded=False, next_step_backend=SessionStepBackend(user_data, step_handler))
+
+# Исходящие запросы к Telegram идут через очередь с лимитами бота и каждого чата
+# Лимит бота делится между репликами поровну
+sender = SendQueue(bot, workers=TELEGRAM_SEND_WORKERS, rate=TELEGRAM_MESSAGES_PER_SECOND / CLUSTER_REPLICAS,
+                   chat_rate=TELEGRAM_CHAT_MESSAGES_PER_SECOND, chat_burst=TELEGRAM_CHAT_BURST)
+sender.start()
 
 # Google Sheets setup
 SHEET_CREDENTIALS_FILE = "credentials.json"
@@ -15,55 +94,109 @@ SPREADSHEET_NAME = "АЗС Отчёты"
 
 # Настройка доступа к Google Sheets
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-credentials = ServiceAccountCredentials.from_json_keyfile_name(SHEET_CREDENTIALS_FILE, scope)
-client = gspread.authorize(credentials)
-sheet = client.open(SPREADSHEET_NAME).sheet1  # Открываем первый лист в таблице
+
+# Сессия с пулом соединений и фоновым обновлением токена создаётся при первом подключении
+sheets_session = None
+
+def connect_sheets():
+    global sheets_session
+    if sheets_session is None:
+        credentials = service_account.Credentials.from_service_account_file(SHEET_CREDENTIALS_FILE, scopes=scope)
+        sheets_session = SheetsSession(credentials, pool_size=SHEETS_POOL_SIZE, refresh_margin=SHEETS_TOKEN_REFRESH_MARGIN)
+        sheets_session.start_refresh()
+    return gspread.authorize(sheets_session.credentials, session=sheets_session)
+
+# Все вызовы Google Sheets идут через очередь с учётом квоты
+sheets_scheduler = SheetsScheduler(requests_per_minute=SHEETS_REQUESTS_PER_MINUTE,
+                                   failure_threshold=SHEETS_FAILURE_THRESHOLD, cooldown=SHEETS_COOLDOWN,
+                                   burst_seconds=SHEETS_BURST_SECONDS)
+sheets_scheduler.start()
+
+# Таблица открывается в фоне, бот начинает принимать обновления сразу
+sheets_connection = SheetsConnection(connect_sheets, SPREADSHEET_NAME, sheets_scheduler, SHEETS_CACHE_PATH,
+                                     retry_base=SHEETS_RETRY_BASE, retry_max=SHEETS_RETRY_MAX)
+
+# Листы станций открываются по одному разу и переиспользуются всеми записями
+worksheets = WorksheetPool(sheets_connection, sheets_scheduler)
+stations = StationRegistry.load(STATIONS_PATH)
+
+# Локальная копия листов отчётов для вопросов о прошлых отчётах: свои записи попадают в неё сразу,
+# строки, дописанные в обход бота, подтягиваются синхронизацией хвоста
+replica = ReportReplica(REPLICA_PATH)
+replica_sync = ReplicaSync(replica, worksheets, sheets_scheduler, titles=stations.worksheets(),
+                           interval=REPLICA_SYNC_INTERVAL)
+
+# Отчёт сначала фиксируется в локальном журнале, затем фоновый поток пишет его в таблицу пачками
+outbox = Outbox(OUTBOX_PATH)
+saved_reports = ReportIndex()  # Дубли отсеиваются до записи в журнал
+counters = CounterIndex()  # Прежние показания счётчиков для сверки отчёта
+def replicate_delivered(worksheet, first_row, rows):
+    # Строки с неизвестным номером подтянет синхронизация хвоста
+    if first_row is not None:
+        replica.apply(first_row, rows, worksheet)
+
+# В кластере отчёты других реплик попадают в общий журнал без сигнала: ведущая перечитывает его по таймеру
+sheets_writer = SheetsWriter(outbox, worksheets, sheets_scheduler, batch_size=SHEETS_BATCH_SIZE, flush_interval=SHEETS_FLUSH_INTERVAL,
+                             retry_base=SHEETS_RETRY_BASE, retry_max=SHEETS_RETRY_MAX, on_delivered=replicate_delivered,
+                             poll_interval=SHEETS_FLUSH_INTERVAL if CLUSTER_REPLICAS > 1 else None)
+
+# Итоги долгов обновляются при каждом сохранении; записи журнала, не учтённые до сбоя, досчитываются при старте
+debt_ledger = DebtLedger(DEBTS_PATH)
+
+# Итоги по дням и месяцам держатся в памяти и пересчитываются из журнала при старте;
+# лист сводки переписывается, только когда они изменились
+rollups = Rollups()
+rollup_writer = RollupWriter(rollups, outbox, worksheets, sheets_scheduler, SUMMARY_WORKSHEET,
+                             interval=SUMMARY_FLUSH_INTERVAL)
+
+def warm_indexes():
+    """Дочитывает индексы из журнала в фоне: приём обновлений не ждёт чтения всего журнала.
+
+    Обработчики сами вызывают catch_up перед обращением к индексу, поэтому
+    до окончания прогрева ответ получается полным, только дольше.
+    """
+    started = time.monotonic()
+    for index in (saved_reports, counters, debt_ledger, rollups):
+        try:
+            index.catch_up(outbox)
+        except Exception as e:
+            print(f"Ошибка чтения журнала в {type(index).__name__}: {e}")
+    print(f"Индексы журнала прочитаны за {time.monotonic() - started:.1f} с")
+
+threading.Thread(target=warm_indexes, name="indexes-warmup", daemon=True).start()
+
+def start_sheets_owner():
+    """Подключение к таблице и фоновые записи в неё; в кластере их запускает только ведущая реплика"""
+    sheets_connection.start()
+    replica_sync.start()
+    sheets_writer.start()
+    rollup_writer.start()
+
+# Обработчики кнопок ответа по этапам отчёта
+router = Router()
+
+# Шаги отчёта показываются через мастер: в режиме WIZARD_MODE одно сообщение редактируется
+wizard = Wizard(bot, sender, user_data, enabled=WIZARD_MODE, timeout=WIZARD_REPLY_TIMEOUT)
 
 # Переменные для временного хранения данных
-user_data = {}
 current_index = 0
 debt = False
 
+# Готовые календари: листание месяцев не пересобирает клавиатуру
+calendars = CalendarCache(max_size=CALENDAR_CACHE_SIZE)
+calendars.warm(datetime.now())
+
 def generate_calendar(year, month):
-    markup = InlineKeyboardMarkup()
-    # Название месяца и навигация
-    row = [
-        InlineKeyboardButton("⬅️", callback_data=f"prev_month_{year}_{month}"),
-        InlineKeyboardButton(f"{datetime(year, month, 1):%B %Y}", callback_data="ignore"),
-        InlineKeyboardButton("➡️", callback_data=f"next_month_{year}_{month}")
-    ]
-    markup.row(*row)
-    
-    # Дни недели
-    days = ["", "", "", "", "", "", ""]
-    markup.row(*[InlineKeyboardButton(day, callback_data="ignore") for day in days])
-    
-    # Дни месяца
-    first_day = datetime(year, month, 1)
-    last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-    calendar_days = ["" for _ in range(first_day.weekday())]  # Пустые кнопки до первого дня месяца
-    calendar_days += [str(day) for day in range(1, last_day.day + 1)]
-    
-    for week in range(0, len(calendar_days), 7):
-        row = [
-            InlineKeyboardButton(day, callback_data=f"select_date_{year}_{month}_{day}")
-            if day else InlineKeyboardButton(" ", callback_data="ignore")
-            for day in calendar_days[week:week + 7]
-        ]
-        markup.row(*row)
-    return markup
+    return calendars.get(year, month)
 
 # Команда /start
 @bot.message_handler(commands=['start'])
 def start_command(message):
-    user_data[message.chat.id] = {
-        'state': 'start'  # Possible states: 'start', 'creating_report', 'correcting_data'
-    }
-    user_data[message.chat.id] = {}
+    user_data[message.chat.id] = Report()
     keyboard = InlineKeyboardMarkup()
     button_create = InlineKeyboardButton(text="Создать отчёт", callback_data="create_report")
     keyboard.add(button_create)
-    bot.send_message(
+    wizard.show(
         message.chat.id,
         "Бот АЗС приветствует вас!",
         reply_markup=keyboard
@@ -77,72 +210,113 @@ def stop_command(message):
     bot.clear_step_handler_by_chat_id(chat_id)
     # Очищаем временные данные пользователя
     user_data.pop(chat_id, None)
-    bot.send_message(chat_id, "Заполнение отчета прервано.")
+    wizard.show(chat_id, "Заполнение отчета прервано.")
+
+@bot.message_handler(commands=['debts'])
+def debts_command(message):
+    debt_ledger.catch_up(outbox)  # Отчёты, сохранённые другими репликами
+    totals = debt_ledger.totals()
+    if not totals:
+        wizard.show(message.chat.id, "Долгов нет.")
+        return
+    lines = ["Долги контрагентов:"]
+    for contractor, volumes in totals:
+        fuels = ", ".join(f"{FUEL_NAMES[fuel]} - {volume} л." for fuel, volume in volumes.items())
+        lines.append(f"{contractor}: {fuels}")
+    wizard.show(message.chat.id, "\n".join(lines))
+
+@bot.message_handler(commands=['month'])
+def month_command(message):
+    # "/month" - текущий месяц, "/month 09.2026" - указанный
+    argument = message.text.partition(' ')[2].strip()
+    try:
+        period = datetime.strptime(argument, "%m.%Y") if argument else datetime.now()
+    except ValueError:
+        wizard.show(message.chat.id, "Укажите месяц в формате ММ.ГГГГ, например /month 09.2026")
+        return
+    rollups.catch_up(outbox)
+    aggregate = rollups.month(period.year, period.month)
+    if aggregate is None:
+        wizard.show(message.chat.id, f"За {period:%m.%Y} отчётов нет.")
+        return
+    lines = [f"Итоги за {period:%m.%Y}, отчётов: {aggregate.reports}"]
+    for fuel, name in FUEL_NAMES.items():
+        litres = aggregate.litres[fuel]
+        lines.append(f"{name}: наличные {litres['sold_cash']:g} л., терминал {litres['sold_card']:g} л., "
+                     f"всего {litres['total_sold']:g} л., в долг {litres['debt']:g} л.")
+    if aggregate.temperature_min is not None:
+        lines.append(f"Температура воздуха: от {aggregate.temperature_min:g} до {aggregate.temperature_max:g}")
+    wizard.show(message.chat.id, "\n".join(lines))
 
 @bot.message_handler(func=lambda message: message.text.startswith('/'))
 def handle_commands(message):
     if message.text == '/stop':
         stop_command(message)  # Вызываем обработчик команды /stop
+    elif message.text == '/debts':
+        debts_command(message)
+    elif message.text.split(' ')[0] == '/month':
+        month_command(message)
     else:
-        bot.send_message(message.chat.id, "Неизвестная команда. Попробуйте /stop или /start.")
+        wizard.show(message.chat.id, "Неизвестная команда. Попробуйте /stop, /start, /debts или /month.")
+
+# Кнопки ответа: обработчик выбирается по этапу отчёта и тексту кнопки
+@bot.message_handler(content_types=['text'])
+def route_text(message):
+    report = user_data.get(message.chat.id)
+    handler = router.resolve(report.stage if report is not None else None, message.text)
+    if handler is not None:
+        timed(handler, message)
+
+@bot.callback_query_handler(func=lambda call: wizard.is_tap(call))
+def wizard_tap(call):
+    wizard.handle_tap(call)
 
 @bot.callback_query_handler(func=lambda call: call.data == "create_report")
 def create_report(call):
-    user_data[call.message.chat.id]['state'] = 'creating_report'
-    bot.delete_message(call.message.chat.id, call.message.message_id)
+    user_data[call.message.chat.id].state = 'creating_report'
     now = datetime.now()
     markup = generate_calendar(now.year, now.month)
-    bot.send_message(call.message.chat.id, "Выберите дату отчета", reply_markup=markup)
+    wizard.show(call.message.chat.id, "Выберите дату отчета", reply_markup=markup, replace=call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("select_date_") or call.data.startswith("prev_month_") or call.data.startswith("next_month_") or call.data == "ignore")
+@bot.callback_query_handler(func=lambda call: parse_callback(call.data) is not None)
 def callback_query(call):
-    data = call.data.split("_")
+    data = parse_callback(call.data)
     
     if data[0] == "ignore":
-        bot.answer_callback_query(call.id)  # Ничего не делаем
+        sender.answer_callback_query(call.message.chat.id, call.id)  # Ничего не делаем
     
-    if data[0] == "prev" or data[0] == "next":
-        year, month = int(data[2]), int(data[3])
-        if data[0] == "prev":
-            month -= 1
-            if month == 0:
-                month = 12
-                year -= 1
-        elif data[0] == "next":
-            month += 1
-            if month == 13:
-                month = 1
-                year += 1
+    if data[0] == "month":
         # Обновляем календарь
-        markup = generate_calendar(year, month)
-        bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=markup)
+        markup = generate_calendar(data[1], data[2])
+        sender.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=markup)
     
-    if data[0] == "select":
-        year, month, day = int(data[2]), int(data[3]), int(data[4])
+    if data[0] == "date":
+        year, month, day = data[1], data[2], data[3]
         selected_date = datetime(year, month, day).strftime("%d.%m.%Y")
-        user_data[call.message.chat.id]['date'] = selected_date
-        if user_data[call.message.chat.id].get('state') == 'correcting_data':
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-            show_summary(call.message.chat.id)
+        user_data[call.message.chat.id].date = selected_date
+        if user_data[call.message.chat.id].state == 'correcting_data':
+            show_summary(call.message.chat.id, replace=call.message)
         else:
             markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
-            global operator1, operator2, operator3
-            operator1 = 'Оператор 1'
-            operator2 = 'Оператор 2'
-            operator3 = 'Оператор 3'
-            markup.add(operator1, operator2, operator3, "Другой")
-            bot.send_message(call.message.chat.id, f"Вы выбрали дату: {selected_date}\n\nУкажите оператора:", reply_markup=markup)
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-
-@bot.message_handler(func=lambda message: message.text in ["Оператор 1", "Оператор 2", "Оператор 3", "Другой"])
+            markup.add(*stations.for_chat(call.message.chat.id).operators, "Другой")
+            wizard.show(call.message.chat.id, f"Вы выбрали дату: {selected_date}\n\nУкажите оператора:", reply_markup=markup,
+                        replace=call.message)
+            # Имена операторов у каждой станции свои, поэтому ответ ждёт шаг диалога, а не маршрут кнопки
+            bot.register_next_step_handler_by_chat_id(call.message.chat.id, handle_operator_choice)
+
 def handle_operator_choice(message):
+    if message.text.startswith('/'):
+            handle_commands(message)  # Перенаправляем команды
+            return
     if message.text == "Другой":
-        bot.send_message(message.chat.id, "Введите имя оператора:")
+        wizard.show(message.chat.id, "Введите имя оператора:")
         bot.register_next_step_handler(message, get_operator)
-    else:
-        user_data[message.chat.id]['operator'] = message.text
-        bot.send_message(message.chat.id, "Укажите температуру воздуха на дату отчёта:")
+    elif message.text in stations.for_chat(message.chat.id).operators:
+        user_data[message.chat.id].operator = message.text
+        wizard.show(message.chat.id, "Укажите температуру воздуха на дату отчёта:")
         bot.register_next_step_handler(message, get_temperature)
+    else:
+        get_operator(message)  # Имя введено вручную, а не кнопкой
 
 # Получение оператора
 def get_operator(message):
@@ -150,11 +324,11 @@ def get_operator(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isalpha():
-        bot.send_message(message.chat.id, "Пожалуйста, введите корректное имя оператора:")
+        wizard.show(message.chat.id, "Пожалуйста, введите корректное имя оператора:")
         bot.register_next_step_handler(message, get_operator)
         return
-    user_data[message.chat.id]['operator'] = message.text
-    bot.send_message(message.chat.id, "Укажите температуру воздуха:")
+    user_data[message.chat.id].operator = message.text
+    wizard.show(message.chat.id, "Укажите температуру воздуха:")
     bot.register_next_step_handler(message, get_temperature)
 
 # Получение температуры
@@ -165,21 +339,21 @@ def get_temperature(message):
     try:
         temperature = float(message.text.replace(",", "."))
     except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение температуры:")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение температуры:")
         bot.register_next_step_handler(message, get_temperature)
         return
-    user_data[message.chat.id]['temperature'] = message.text
+    user_data[message.chat.id].temperature = temperature
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Добавить Комментарии", "Нет Комментариев")
-    bot.send_message(message.chat.id, "Добавить комментарии по отчетному дню (прокачка, взлив, и т.д.):", reply_markup=markup)
+    wizard.show(message.chat.id, "Добавить комментарии по отчетному дню (прокачка, взлив, и т.д.):", reply_markup=markup)
 
-@bot.message_handler(func=lambda message: message.text in ["Добавить Комментарии", "Нет Комментариев"])
+@router.route(["Добавить Комментарии", "Нет Комментариев"])
 def handle_comments_choice(message):
     if message.text == "Добавить Комментарии":
-        bot.send_message(message.chat.id, "Введите комментарии:")
+        wizard.show(message.chat.id, "Введите комментарии:")
         bot.register_next_step_handler(message, get_comments)
     elif message.text == 'Нет Комментариев':
-        user_data[message.chat.id]['comments'] = "Без комментариев"
+        user_data[message.chat.id].comments = "Без комментариев"
         show_summary(message.chat.id)
 
 # Получение комментариев
@@ -187,28 +361,28 @@ def get_comments(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
-    user_data[message.chat.id]['comments'] = message.text
+    user_data[message.chat.id].comments = message.text
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Всё верно, сохранить данные", "Нужно изменить данные")
     summary = (
         f"Проверьте данные для сохраниения в отчет 1/3:\n"
-        f"Дата: {user_data[message.chat.id]['date']}\n"
-        f"Оператор: {user_data[message.chat.id]['operator']}\n"
-        f"Температура воздуха: {user_data[message.chat.id]['temperature']}\n"
-        f"Комментарий: {user_data[message.chat.id]['comments']}"
+        f"Дата: {user_data[message.chat.id].date}\n"
+        f"Оператор: {user_data[message.chat.id].operator}\n"
+        f"Температура воздуха: {user_data[message.chat.id].temperature:g}\n"
+        f"Комментарий: {user_data[message.chat.id].comments}"
     )
-    bot.send_message(message.chat.id, summary, reply_markup=markup)
+    wizard.show(message.chat.id, summary, reply_markup=markup)
 
-@bot.message_handler(func=lambda message: message.text in ["Всё верно, сохранить данные", "Нужно изменить данные"])
+@router.route(["Всё верно, сохранить данные", "Нужно изменить данные"], stage='general')
 def handle_data_confirmation(message):
     if message.text == "Всё верно, сохранить данные":
         next_block2(message) # Pass the message object, not just the chat ID
     else:
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Дата", "Оператор", "Температура", "Комментарий", "Ничего менять не нужно")
-        bot.send_message(message.chat.id, "Какие данные необходимо исправить?", reply_markup=markup)
+        wizard.show(message.chat.id, "Какие данные необходимо исправить?", reply_markup=markup)
 
-@bot.message_handler(func=lambda message: message.text in ["Дата", "Оператор", "Температура", "Комментарий", "Ничего менять не нужно"])
+@router.route(["Дата", "Оператор", "Температура", "Комментарий", "Ничего менять не нужно"])
 def handle_data_correction(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
@@ -217,31 +391,31 @@ def handle_data_correction(message):
         next_block2(message) # Pass the message object, not just the chat ID
     
     if message.text == "Дата":
-        user_data[message.chat.id]['state'] = 'correcting_data'
+        user_data[message.chat.id].state = 'correcting_data'
         now = datetime.now()
         markup = generate_calendar(now.year, now.month)
-        bot.send_message(message.chat.id, "Выберите новую дату отчета", reply_markup=markup)
+        wizard.show(message.chat.id, "Выберите новую дату отчета", reply_markup=markup)
     
     elif message.text == "Оператор":
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
-        markup.add(operator1, operator2, operator3, "Другой")
-        bot.send_message(message.chat.id, "Укажите нового оператора:", reply_markup=markup)
+        markup.add(*stations.for_chat(message.chat.id).operators, "Другой")
+        wizard.show(message.chat.id, "Укажите нового оператора:", reply_markup=markup)
         bot.register_next_step_handler(message, update_operator)
     
     elif message.text == "Температура":
-        bot.send_message(message.chat.id, "Укажите новую температуру воздуха:")
+        wizard.show(message.chat.id, "Укажите новую температуру воздуха:")
         bot.register_next_step_handler(message, update_temperature)
     
     elif message.text == "Комментарий":
-        bot.send_message(message.chat.id, "Введите новые комментарии:")
+        wizard.show(message.chat.id, "Введите новые комментарии:")
         bot.register_next_step_handler(message, update_comments)
 
 def update_operator(message):
     if message.text == "Другой":
-        bot.send_message(message.chat.id, "Введите имя нового оператора:")
+        wizard.show(message.chat.id, "Введите имя нового оператора:")
         bot.register_next_step_handler(message, update_operator_custom)
     else:
-        user_data[message.chat.id]['operator'] = message.text
+        user_data[message.chat.id].operator = message.text
         show_summary(message.chat.id)
 
 def update_operator_custom(message):
@@ -249,10 +423,10 @@ def update_operator_custom(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isalpha():
-        bot.send_message(message.chat.id, "Пожалуйста, введите корректное имя оператора: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите корректное имя оператора: ")
         bot.register_next_step_handler(message, update_operator_custom)
         return
-    user_data[message.chat.id]['operator'] = message.text
+    user_data[message.chat.id].operator = message.text
     show_summary(message.chat.id)
 
 def update_temperature(message):
@@ -262,88 +436,88 @@ def update_temperature(message):
     try:
         temperature = float(message.text.replace(",", "."))
     except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение температуры:")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение температуры:")
         bot.register_next_step_handler(message, update_temperature)
         return
-    user_data[message.chat.id]['temperature'] = message.text
+    user_data[message.chat.id].temperature = temperature
     show_summary(message.chat.id)
 
 def update_comments(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
-    user_data[message.chat.id]['comments'] = message.text
+    user_data[message.chat.id].comments = message.text
     show_summary(message.chat.id)
 
-def show_summary(chat_id):
+def show_summary(chat_id, replace=None):
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Всё верно, сохранить данные", "Нужно изменить данные")
     summary = (
         f"Проверьте данные для сохранения в отчет 1/3:\n"
-        f"Дата: {user_data[chat_id]['date']}\n"
-        f"Оператор: {user_data[chat_id]['operator']}\n"
-        f"Температура воздуха: {user_data[chat_id]['temperature']}\n"
-        f"Комментарий: {user_data[chat_id]['comments']}"
+        f"Дата: {user_data[chat_id].date}\n"
+        f"Оператор: {user_data[chat_id].operator}\n"
+        f"Температура воздуха: {user_data[chat_id].temperature:g}\n"
+        f"Комментарий: {user_data[chat_id].comments}"
     )
-    bot.send_message(chat_id, summary, reply_markup=markup)
+    wizard.show(chat_id, summary, reply_markup=markup, replace=replace)
+
+def counter_warning(chat_id, fuel):
+    """Строка-предупреждение для сводки блока, если разница показаний счётчика не сходится с продажами"""
+    report = user_data[chat_id]
+    block = report.fuel_ai92 if fuel == "ai92" else report.fuel_dt
+    counters.catch_up(outbox)
+    warning = counters.check(stations.for_chat(chat_id).id, fuel, report.date, block, tolerance=COUNTER_TOLERANCE)
+    return f"Внимание: {warning}\n" if warning else ""
 
 # Функция для записи данных в Google Sheets
-def save_to_google_sheets(user_id):
-    """Функция для сохранения данных в Google Sheets"""
-    data = user_data[user_id]
-    
-    # Prepare debtor lists with up to 5 entries each, fill with empty strings if less
-    ai92_debtors = [f"{debtor['contractor']} - {debtor['volume']} л." for debtor in data['fuel_ai92']['debtors']]
-    ai92_debtors += [''] * (5 - len(ai92_debtors))
-    
-    dt_debtors = [f"{debtor['contractor']} - {debtor['volume']} л." for debtor in data['fuel_dt']['debtors']]
-    dt_debtors += [''] * (5 - len(dt_debtors))
-    
-    # Construct the row data
-    row = [
-        data['date'],
-        data['operator'],
-        data['temperature'],
-        data['comments'],
-        data['fuel_ai92']['sold_cash'],
-        data['fuel_ai92']['sold_card'],
-        data['fuel_ai92']['total_sold'],
-        *ai92_debtors,  # Unpack AI-92 debtors into the row
-        data['fuel_dt']['sold_cash'],
-        data['fuel_dt']['sold_card'],
-        data['fuel_dt']['total_sold'],
-        *dt_debtors   # Unpack DT debtors into the row
-    ]
-    
-    # Determine the next available row
-    next_row = len(sheet.col_values(1)) + 1  # Find the first empty row in column 1
-    
-    # Create a list of Cell objects to update
-    cells = [gspread.cell.Cell(row=next_row, col=i+1, value=value) for i, value in enumerate(row)]
-    
-    try:
-        # Update the cells in the worksheet
-        sheet.update_cells(cells)
-    except gspread.exceptions.APIError as e:
-        # Handle the API error, e.g., by logging or attempting to add a new row
-        print(f"APIError: {e}")
-        # Optionally, add a new row and try again
-        sheet.add_rows(1)
-        sheet.update_cells(cells)
+def save_to_google_sheets(user_id, force=False):
+    """Функция для сохранения данных в Google Sheets; False, если отчёт не сохранён"""
+    report = user_data[user_id]
+    row = report.to_row()
+    station = stations.for_chat(user_id)
+    key = report_key(station.id, report.date, row)
+    saved_reports.catch_up(outbox)
+    status = saved_reports.check(key, station.id, report.date)
+    if status == CONFLICT and not force:
+        markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
+        markup.add("Да, сохранить ещё один отчёт", "Нет, не сохранять")
+        wizard.show(user_id, f"За {report.date} уже сохранён отчёт с другими данными. Сохранить ещё один?",
+                    reply_markup=markup)
+        return False
+    # Строка фиксируется на диске, оператор не ждёт Google API
+    if status == DUPLICATE or sheets_writer.put(row, key=key, station=station.id, date=report.date,
+                                                        worksheet=station.worksheet) is None:
+        wizard.show(user_id, "Этот отчёт уже сохранён.")
+        return False
+    saved_reports.add(key, station.id, report.date)
+    # По порядку журнала: отчёты соседних чатов не обгоняют друг друга
+    debt_ledger.catch_up(outbox)
+    rollups.catch_up(outbox)
+    counters.catch_up(outbox)
+    return True
+
+@router.route(["Да, сохранить ещё один отчёт", "Нет, не сохранять"], stage='dt')
+def handle_conflict_confirmation(message):
+    if message.text == "Да, сохранить ещё один отчёт":
+        if save_to_google_sheets(message.chat.id, force=True):
+            wizard.show(message.chat.id, "Данные ДТ-К5 сохранены.")
+    else:
+        wizard.show(message.chat.id, "Отчёт не сохранён.")
 
 # === Блок 2: Работа с АИ-92-К5 ===
 
 def next_block2(message):
     """Переход к работе с топливом АИ-92-К5"""
+    user_data[message.chat.id].stage = 'ai92'
     markup = InlineKeyboardMarkup()
     markup.add(InlineKeyboardButton("Заполнить данные", callback_data="next"))
-    bot.send_message(message.chat.id, "Данные сохранены!\n\nПереходим к следующему разделу отчёта.\nДанные по топливу АИ-92-К5.", reply_markup=markup)
+    wizard.show(message.chat.id, "Данные сохранены!\n\nПереходим к следующему разделу отчёта.\nДанные по топливу АИ-92-К5.", reply_markup=markup)
 
 @bot.callback_query_handler(func=lambda call: call.data == "next")
 def handle_next_button(call):
     delete_markup = telebot.types.ReplyKeyboardRemove()
-    bot.delete_message(call.message.chat.id, call.message.message_id)
-    bot.send_message(call.message.chat.id, "Показания счетчика АИ-92-К5 (в литрах):", reply_markup=delete_markup)
+    wizard.show(call.message.chat.id, "Показания счетчика АИ-92-К5 (в литрах):", reply_markup=delete_markup,
+                replace=call.message)
     bot.register_next_step_handler(call.message, get_ai92_counter)
 
 def get_ai92_counter(message):
@@ -351,18 +525,11 @@ def get_ai92_counter(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение показаний счетчика: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение показаний счетчика: ")
         bot.register_next_step_handler(message, get_ai92_counter)
         return
-    user_data[message.chat.id]['fuel_ai92'] = {
-    'counter': '',
-    'sold_cash': '',
-    'sold_card': '',
-    'total_sold': '',
-    'debtors': []   
-    }
-    user_data[message.chat.id]['fuel_ai92']['counter'] = message.text
-    bot.send_message(message.chat.id, "Продано АИ-92-К5 (в литрах) за наличные:")
+    user_data[message.chat.id].fuel_ai92 = FuelBlock(counter=int(message.text))
+    wizard.show(message.chat.id, "Продано АИ-92-К5 (в литрах) за наличные:")
     bot.register_next_step_handler(message, get_ai92_sold_cash)
 
 def get_ai92_sold_cash(message):
@@ -370,11 +537,11 @@ def get_ai92_sold_cash(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение продажи за наличные: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение продажи за наличные: ")
         bot.register_next_step_handler(message, get_ai92_sold_cash)
         return
-    user_data[message.chat.id]['fuel_ai92']['sold_cash'] = message.text
-    bot.send_message(message.chat.id, "Продано АИ-92-К5 (в литрах) по терминалу:")
+    user_data[message.chat.id].fuel_ai92.sold_cash = int(message.text)
+    wizard.show(message.chat.id, "Продано АИ-92-К5 (в литрах) по терминалу:")
     bot.register_next_step_handler(message, get_ai92_sold_card)
 
 def get_summary_block2(message):
@@ -382,16 +549,17 @@ def get_summary_block2(message):
             handle_commands(message)  # Перенаправляем команды
             return
     summary = "Проверьте данные для сохранения в отчет 2/3:\n"
-    summary += f"Наличные: {user_data[message.chat.id]['fuel_ai92']['sold_cash']} л.\n"
-    summary += f"Терминал: {user_data[message.chat.id]['fuel_ai92']['sold_card']} л.\n"
-    summary += f"Всего: {user_data[message.chat.id]['fuel_ai92']['total_sold']} л.\n"
-    if user_data[message.chat.id]['fuel_ai92']['debtors']:
+    summary += f"Наличные: {user_data[message.chat.id].fuel_ai92.sold_cash} л.\n"
+    summary += f"Терминал: {user_data[message.chat.id].fuel_ai92.sold_card} л.\n"
+    summary += f"Всего: {user_data[message.chat.id].fuel_ai92.total_sold} л.\n"
+    if user_data[message.chat.id].fuel_ai92.debtors:
         summary += "В долг:\n"
-        for debtor in user_data[message.chat.id]['fuel_ai92']['debtors']:
-            summary += f"Контрагент: {debtor['contractor']}, Сумма: {debtor['volume']} л.\n"
+        for debtor in user_data[message.chat.id].fuel_ai92.debtors:
+            summary += f"Контрагент: {debtor.contractor}, Сумма: {debtor.volume} л.\n"
+    summary += counter_warning(message.chat.id, "ai92")
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Всё верно, сохранить данные", "Нужно изменить данные")
-    bot.send_message(message.chat.id, summary, reply_markup=markup)
+    wizard.show(message.chat.id, summary, reply_markup=markup)
     bot.register_next_step_handler(message, confirm_ai92_data)
         
 def get_ai92_sold_card(message):
@@ -399,20 +567,17 @@ def get_ai92_sold_card(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение продажи по терминалу: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение продажи по терминалу: ")
         bot.register_next_step_handler(message, get_ai92_sold_card)
         return
-    user_data[message.chat.id]['fuel_ai92']['sold_card'] = message.text
+    user_data[message.chat.id].fuel_ai92.sold_card = int(message.text)
     try:
-        sold_cash = int(user_data[message.chat.id]['fuel_ai92']['sold_cash'])
-        sold_card = int(user_data[message.chat.id]['fuel_ai92']['sold_card'])
-        total_sold = sold_cash + sold_card
-        user_data[message.chat.id]['fuel_ai92']['total_sold'] = total_sold
+        total_sold = user_data[message.chat.id].fuel_ai92.recalculate_total()
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Сумма АИ-92-К5 за день верна", "Нужно ввести другую сумму АИ-92-К5")
-        bot.send_message(message.chat.id, f"Общее количество проданного АИ-92-К5 (в литрах): {total_sold}", reply_markup=markup)
+        wizard.show(message.chat.id, f"Общее количество проданного АИ-92-К5 (в литрах): {total_sold}", reply_markup=markup)
     except (KeyError, ValueError) as e:
-        bot.send_message(message.chat.id, f"Ошибка: {e}. Пожалуйста, проверьте введенные данные.")
+        wizard.show(message.chat.id, f"Ошибка: {e}. Пожалуйста, проверьте введенные данные.")
 
 def get_debt_amount(message):
     if message.text.lower() == "да, отпускали в долг":
@@ -420,21 +585,17 @@ def get_debt_amount(message):
         select_contractor(message)
     else:
         # If no more debtors, move to summary
-        if not user_data[message.chat.id]['fuel_ai92']['debtors']:
-            user_data[message.chat.id]['fuel_ai92']['debtors'].append({"contractor": "Нет", "volume": 0})
+        if not user_data[message.chat.id].fuel_ai92.debtors:
+            user_data[message.chat.id].fuel_ai92.debtors.append(Debt("Нет", 0))
         get_summary_block2(message)
 
 def select_contractor(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
-    global contractor1, contractor2, contractor3
-    contractor1 = "Контрагент 1"
-    contractor2 = "Контрагент 2"
-    contractor3 = "Контрагент 3"
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
-    markup.add(contractor1, contractor2, contractor3, "Другой Контрагент")
-    bot.send_message(message.chat.id, "Выберите Контрагента, получившего топливо в долг", reply_markup=markup)
+    markup.add(*stations.for_chat(message.chat.id).contractors, "Другой Контрагент")
+    wizard.show(message.chat.id, "Выберите Контрагента, получившего топливо в долг", reply_markup=markup)
     bot.register_next_step_handler(message, debt_contractor)
 
 def debt_contractor(message):
@@ -442,7 +603,7 @@ def debt_contractor(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if message.text == "Другой Контрагент":
-        bot.send_message(message.chat.id, "Введите название контрагента: ")
+        wizard.show(message.chat.id, "Введите название контрагента: ")
         bot.register_next_step_handler(message, get_debt_contractor)
     else:
         add_debtor(message, message.text)
@@ -452,7 +613,7 @@ def get_debt_contractor(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isalpha():
-        bot.send_message(message.chat.id, "Пожалуйста, введите корректное название контрагента: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите корректное название контрагента: ")
         bot.register_next_step_handler(message, get_debt_contractor)
     else:
         add_debtor(message, message.text)
@@ -461,8 +622,8 @@ def add_debtor(message, contractor):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
-    bot.send_message(message.chat.id, f"Сколько отпущено {contractor} (в литрах): ")
-    bot.register_next_step_handler(message, lambda msg: debt_volume(msg, contractor))
+    wizard.show(message.chat.id, f"Сколько отпущено {contractor} (в литрах): ")
+    bot.register_next_step_handler(message, debt_volume, contractor)
 
 def still_debt(message):
     if message.text.startswith('/'):
@@ -478,17 +639,17 @@ def debt_volume(message, contractor):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
-        bot.register_next_step_handler(message, lambda msg: debt_volume(msg, contractor))
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        bot.register_next_step_handler(message, debt_volume, contractor)
         return
-    volume = message.text
-    user_data[message.chat.id]['fuel_ai92']['debtors'].append({"contractor": contractor, "volume": volume})
+    volume = int(message.text)
+    user_data[message.chat.id].fuel_ai92.debtors.append(Debt(contractor, volume))
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Да, еще отпускали в долг", "Нет, больше не отпускали")
-    bot.send_message(message.chat.id, "Отпускали еще АИ-92-К5 в долг?", reply_markup=markup)
+    wizard.show(message.chat.id, "Отпускали еще АИ-92-К5 в долг?", reply_markup=markup)
     bot.register_next_step_handler(message, still_debt)
 
-@bot.message_handler(func=lambda message: message.text in ["Сумма АИ-92-К5 за день верна", "Нужно ввести другую сумму АИ-92-К5"])
+@router.route(["Сумма АИ-92-К5 за день верна", "Нужно ввести другую сумму АИ-92-К5"])
 def handle_total_sold_confirmation(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
@@ -496,10 +657,10 @@ def handle_total_sold_confirmation(message):
     if message.text == "Сумма АИ-92-К5 за день верна":
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Да, отпускали в долг", "Нет, в долг не отпускали")
-        bot.send_message(message.chat.id, "Отпускали АИ-92-К5 в долг?", reply_markup=markup)
+        wizard.show(message.chat.id, "Отпускали АИ-92-К5 в долг?", reply_markup=markup)
         bot.register_next_step_handler(message, get_debt_amount)
     elif message.text == "Нужно ввести другую сумму АИ-92_К5":
-        bot.send_message(message.chat.id, "Введите корректную сумму проданного АИ-92-К5 (в литрах): ")
+        wizard.show(message.chat.id, "Введите корректную сумму проданного АИ-92-К5 (в литрах): ")
         bot.register_next_step_handler(message, correct_total_sold)
 
 def correct_total_sold(message):
@@ -507,14 +668,14 @@ def correct_total_sold(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, correct_total_sold)
         return
-    user_data[message.chat.id]['fuel_ai92']['total_sold'] = message.text
-    bot.send_message(message.chat.id, "Отпускали АИ-92-К5 в долг?")
+    user_data[message.chat.id].fuel_ai92.total_sold = int(message.text)
+    wizard.show(message.chat.id, "Отпускали АИ-92-К5 в долг?")
     bot.register_next_step_handler(message, get_debt_amount)
 
-@bot.message_handler(func=lambda message: message.text in ["Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно"])
+@router.route(["Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно"], stage='ai92')
 def handle_data_correction_block2(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
@@ -523,21 +684,21 @@ def handle_data_correction_block2(message):
         next_block3(message)
 
     if message.text == "Продажи за наличные":
-        bot.send_message(message.chat.id, "Введите новое значение продажи за наличные (в литрах):")
+        wizard.show(message.chat.id, "Введите новое значение продажи за наличные (в литрах):")
         bot.register_next_step_handler(message, update_ai92_sold_cash)
     
     elif message.text == "Продажи по терминалу":
-        bot.send_message(message.chat.id, "Введите новое значение продажи по терминалу (в литрах):")
+        wizard.show(message.chat.id, "Введите новое значение продажи по терминалу (в литрах):")
         bot.register_next_step_handler(message, update_ai92_sold_card)
     
     elif message.text == "Всего продано":
-        bot.send_message(message.chat.id, "Введите новое общее количество проданного (в литрах):")
+        wizard.show(message.chat.id, "Введите новое общее количество проданного (в литрах):")
         bot.register_next_step_handler(message, update_ai92_total_sold)
     
     elif message.text == "Отдали в долг":
         # Handle debtors correction
         # For simplicity, assume re-entering debtors
-        user_data[message.chat.id]['fuel_ai92']['debtors'] = []
+        user_data[message.chat.id].fuel_ai92.debtors = []
         select_contractor(message)
 
 def update_ai92_sold_cash(message):
@@ -545,18 +706,12 @@ def update_ai92_sold_cash(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, update_ai92_sold_cash)
         return
-    user_data[message.chat.id]['fuel_ai92']['sold_cash'] = message.text
+    user_data[message.chat.id].fuel_ai92.sold_cash = int(message.text)
     # Recalculate total_sold if necessary
-    try:
-        sold_cash = int(user_data[message.chat.id]['fuel_ai92']['sold_cash'])
-        sold_card = int(user_data[message.chat.id]['fuel_ai92']['sold_card'])
-        total_sold = sold_cash + sold_card
-        user_data[message.chat.id]['fuel_ai92']['total_sold'] = total_sold
-    except (KeyError, ValueError):
-        pass
+    user_data[message.chat.id].fuel_ai92.recalculate_total()
     get_summary_block2(message)
 
 def update_ai92_sold_card(message):
@@ -564,18 +719,12 @@ def update_ai92_sold_card(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, update_ai92_sold_card)
         return
-    user_data[message.chat.id]['fuel_ai92']['sold_card'] = message.text
+    user_data[message.chat.id].fuel_ai92.sold_card = int(message.text)
     # Recalculate total_sold if necessary
-    try:
-        sold_cash = int(user_data[message.chat.id]['fuel_ai92']['sold_cash'])
-        sold_card = int(user_data[message.chat.id]['fuel_ai92']['sold_card'])
-        total_sold = sold_cash + sold_card
-        user_data[message.chat.id]['fuel_ai92']['total_sold'] = total_sold
-    except (KeyError, ValueError):
-        pass
+    user_data[message.chat.id].fuel_ai92.recalculate_total()
     get_summary_block2(message)
 
 def update_ai92_total_sold(message):
@@ -583,21 +732,17 @@ def update_ai92_total_sold(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, update_ai92_total_sold)
         return
-    user_data[message.chat.id]['fuel_ai92']['total_sold'] = message.text
+    user_data[message.chat.id].fuel_ai92.total_sold = int(message.text)
     get_summary_block2(message)
 
 # Handle debtors correction
 def select_contractor(message):
-    global contractor1, contractor2, contractor3
-    contractor1 = "Контрагент 1"
-    contractor2 = "Контрагент 2"
-    contractor3 = "Контрагент 3"
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
-    markup.add(contractor1, contractor2, contractor3, "Другой Контрагент")
-    bot.send_message(message.chat.id, "Выберите Контрагента, получившего топливо в долг или нажмите 'Нет, больше не отпускали':", reply_markup=markup)
+    markup.add(*stations.for_chat(message.chat.id).contractors, "Другой Контрагент")
+    wizard.show(message.chat.id, "Выберите Контрагента, получившего топливо в долг или нажмите 'Нет, больше не отпускали':", reply_markup=markup)
     bot.register_next_step_handler(message, update_debtors)
 
 def update_debtors(message):
@@ -605,11 +750,11 @@ def update_debtors(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if message.text.lower() == "нет, больше не отпускали":
-        user_data[message.chat.id]['fuel_ai92']['debtors'].append({"contractor": "Нет", "volume": 0})
+        user_data[message.chat.id].fuel_ai92.debtors.append(Debt("Нет", 0))
         get_summary_block2(message)
         return
     if message.text == "Другой Контрагент":
-        bot.send_message(message.chat.id, "Введите название контрагента: ")
+        wizard.show(message.chat.id, "Введите название контрагента: ")
         bot.register_next_step_handler(message, get_debt_contractor_update)
     else:
         add_debtor_update(message, message.text)
@@ -619,7 +764,7 @@ def get_debt_contractor_update(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isalpha():
-        bot.send_message(message.chat.id, "Пожалуйста, введите корректное название контрагента: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите корректное название контрагента: ")
         bot.register_next_step_handler(message, get_debt_contractor_update)
     else:
         add_debtor_update(message, message.text)
@@ -628,22 +773,22 @@ def add_debtor_update(message, contractor):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
-    bot.send_message(message.chat.id, f"Сколько отпущено {contractor} (в литрах): ")
-    bot.register_next_step_handler(message, lambda msg: debt_volume_update(msg, contractor))
+    wizard.show(message.chat.id, f"Сколько отпущено {contractor} (в литрах): ")
+    bot.register_next_step_handler(message, debt_volume_update, contractor)
 
 def debt_volume_update(message, contractor):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
-        bot.register_next_step_handler(message, lambda msg: debt_volume_update(msg, contractor))
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        bot.register_next_step_handler(message, debt_volume_update, contractor)
         return
-    volume = message.text
-    user_data[message.chat.id]['fuel_ai92']['debtors'].append({"contractor": contractor, "volume": volume})
+    volume = int(message.text)
+    user_data[message.chat.id].fuel_ai92.debtors.append(Debt(contractor, volume))
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Да, еще отпускали в долг", "Нет, больше не отпускали")
-    bot.send_message(message.chat.id, "Отпускали еще АИ-92-К5 в долг?", reply_markup=markup)
+    wizard.show(message.chat.id, "Отпускали еще АИ-92-К5 в долг?", reply_markup=markup)
     bot.register_next_step_handler(message, still_debt_update)
 
 def still_debt_update(message):
@@ -655,6 +800,7 @@ def still_debt_update(message):
 
 # === Блок 3: Работа с ДТ ===
 
+@router.route(["Всё верно, сохранить данные", "Нужно изменить данные"], stage='ai92')
 def confirm_ai92_data(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
@@ -664,13 +810,14 @@ def confirm_ai92_data(message):
     if message.text.lower() == "нужно изменить данные":
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно")
-        bot.send_message(message.chat.id, "Какие данные необходимо исправить?", reply_markup=markup)
+        wizard.show(message.chat.id, "Какие данные необходимо исправить?", reply_markup=markup)
 
 # === Блок 3: Работа с ДТ-К5 ===
 
 def next_block3(message):
     """Переход к работе с топливом ДТ-К5"""
-    bot.send_message(message.chat.id, "Показания счетчика ДТ-К5 (в литрах):")
+    user_data[message.chat.id].stage = 'dt'
+    wizard.show(message.chat.id, "Показания счетчика ДТ-К5 (в литрах):")
     bot.register_next_step_handler(message, get_dt_counter)
 
 def get_dt_counter(message):
@@ -678,18 +825,11 @@ def get_dt_counter(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение показаний счетчика: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение показаний счетчика: ")
         bot.register_next_step_handler(message, get_dt_counter)
         return
-    user_data[message.chat.id]['fuel_dt'] = {
-        'counter': '',
-        'sold_cash': '',
-        'sold_card': '',
-        'total_sold': '',
-        'debtors': []
-    }
-    user_data[message.chat.id]['fuel_dt']['counter'] = message.text
-    bot.send_message(message.chat.id, "Продано ДТ-К5 (в литрах) за наличные:")
+    user_data[message.chat.id].fuel_dt = FuelBlock(counter=int(message.text))
+    wizard.show(message.chat.id, "Продано ДТ-К5 (в литрах) за наличные:")
     bot.register_next_step_handler(message, get_dt_sold_cash)
 
 def get_dt_sold_cash(message):
@@ -697,11 +837,11 @@ def get_dt_sold_cash(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение продажи за наличные: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение продажи за наличные: ")
         bot.register_next_step_handler(message, get_dt_sold_cash)
         return
-    user_data[message.chat.id]['fuel_dt']['sold_cash'] = message.text
-    bot.send_message(message.chat.id, "Продано ДТ-К5 (в литрах) по терминалу:")
+    user_data[message.chat.id].fuel_dt.sold_cash = int(message.text)
+    wizard.show(message.chat.id, "Продано ДТ-К5 (в литрах) по терминалу:")
     bot.register_next_step_handler(message, get_dt_sold_card)
 
 def get_dt_sold_card(message):
@@ -709,23 +849,20 @@ def get_dt_sold_card(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение продажи по терминалу: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение продажи по терминалу: ")
         bot.register_next_step_handler(message, get_dt_sold_card)
         return
-    user_data[message.chat.id]['fuel_dt']['sold_card'] = message.text
+    user_data[message.chat.id].fuel_dt.sold_card = int(message.text)
     try:
-        sold_cash = int(user_data[message.chat.id]['fuel_dt']['sold_cash'])
-        sold_card = int(user_data[message.chat.id]['fuel_dt']['sold_card'])
-        total_sold = sold_cash + sold_card
-        user_data[message.chat.id]['fuel_dt']['total_sold'] = total_sold
+        total_sold = user_data[message.chat.id].fuel_dt.recalculate_total()
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Сумма ДТ-К5 за день верна", "Нужно ввести другую сумму ДТ-К5")
-        bot.send_message(message.chat.id, f"Общее количество проданного ДТ-К5 (в литрах): {total_sold}", reply_markup=markup)
+        wizard.show(message.chat.id, f"Общее количество проданного ДТ-К5 (в литрах): {total_sold}", reply_markup=markup)
         bot.register_next_step_handler(message, handle_total_sold_confirmation_block3)
     except (KeyError, ValueError) as e:
-        bot.send_message(message.chat.id, f"Ошибка: {e}. Пожалуйста, проверьте введенные данные.")
+        wizard.show(message.chat.id, f"Ошибка: {e}. Пожалуйста, проверьте введенные данные.")
 
-@bot.message_handler(func=lambda message: message.text in ["Сумма ДТ-К5 за день верна", "Нужно ввести другую сумму ДТ-К5"])
+@router.route(["Сумма ДТ-К5 за день верна", "Нужно ввести другую сумму ДТ-К5"])
 def handle_total_sold_confirmation_block3(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
@@ -734,10 +871,10 @@ def handle_total_sold_confirmation_block3(message):
         # Proceed to ask about debtors
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Да, отпускали в долг", "Нет, в долг не отпускали")
-        bot.send_message(message.chat.id, "Отпускали ДТ-К5 в долг?", reply_markup=markup)
+        wizard.show(message.chat.id, "Отпускали ДТ-К5 в долг?", reply_markup=markup)
         bot.register_next_step_handler(message, get_debt_amount_dt)
     elif message.text == "Нужно ввести другую сумму ДТ-К5":
-        bot.send_message(message.chat.id, "Введите корректную сумму проданного ДТ-К5 (в литрах): ")
+        wizard.show(message.chat.id, "Введите корректную сумму проданного ДТ-К5 (в литрах): ")
         bot.register_next_step_handler(message, correct_total_sold_dt)
 
 def correct_total_sold_dt(message):
@@ -745,14 +882,14 @@ def correct_total_sold_dt(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, correct_total_sold_dt)
         return
-    user_data[message.chat.id]['fuel_dt']['total_sold'] = message.text
+    user_data[message.chat.id].fuel_dt.total_sold = int(message.text)
     # After correcting total sold, ask about debts
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Да, отпускали в долг", "Нет, в долг не отпускали")
-    bot.send_message(message.chat.id, "Отпускали ДТ-К5 в долг?", reply_markup=markup)
+    wizard.show(message.chat.id, "Отпускали ДТ-К5 в долг?", reply_markup=markup)
     bot.register_next_step_handler(message, get_debt_amount_dt)
 
 def get_summary_block3(message):
@@ -760,38 +897,39 @@ def get_summary_block3(message):
             handle_commands(message)  # Перенаправляем команды
             return
     summary = "Проверьте данные для сохранения в отчет 2/3:\n"
-    summary += f"Наличные: {user_data[message.chat.id]['fuel_dt']['sold_cash']} л.\n"
-    summary += f"Терминал: {user_data[message.chat.id]['fuel_dt']['sold_card']} л.\n"
-    summary += f"Всего: {user_data[message.chat.id]['fuel_dt']['total_sold']} л.\n"
-    if user_data[message.chat.id]['fuel_dt']['debtors']:
+    summary += f"Наличные: {user_data[message.chat.id].fuel_dt.sold_cash} л.\n"
+    summary += f"Терминал: {user_data[message.chat.id].fuel_dt.sold_card} л.\n"
+    summary += f"Всего: {user_data[message.chat.id].fuel_dt.total_sold} л.\n"
+    if user_data[message.chat.id].fuel_dt.debtors:
         summary += "В долг:\n"
-        for debtor in user_data[message.chat.id]['fuel_dt']['debtors']:
-            summary += f"Контрагент: {debtor['contractor']}, Сумма: {debtor['volume']} л.\n"
+        for debtor in user_data[message.chat.id].fuel_dt.debtors:
+            summary += f"Контрагент: {debtor.contractor}, Сумма: {debtor.volume} л.\n"
+    summary += counter_warning(message.chat.id, "dt")
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Всё верно, сохранить данные", "Нужно изменить данные")
-    bot.send_message(message.chat.id, summary, reply_markup=markup)
+    wizard.show(message.chat.id, summary, reply_markup=markup)
     bot.register_next_step_handler(message, confirm_dt_data)
 
-@bot.message_handler(func=lambda message: message.text in ["Всё верно, сохранить данные", "Нужно изменить данные"])
+@router.route(["Всё верно, сохранить данные", "Нужно изменить данные"], stage='dt')
 def confirm_dt_data(message):
     if message.text == "Всё верно, сохранить данные":
-        bot.send_message(message.chat.id, "Данные ДТ-К5 сохранены.")
-        save_to_google_sheets(message.chat.id)
+        if save_to_google_sheets(message.chat.id):
+            wizard.show(message.chat.id, "Данные ДТ-К5 сохранены.")
     else:
         markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
         markup.add("Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно")
-        bot.send_message(message.chat.id, "Какие данные необходимо исправить?", reply_markup=markup)
+        wizard.show(message.chat.id, "Какие данные необходимо исправить?", reply_markup=markup)
         bot.register_next_step_handler(message, handle_data_correction_block3)
 
 def get_debt_amount_dt(message):
     if message.text == "Да, отпускали в долг":
         select_contractor_dt(message)
     else:
-        if not user_data[message.chat.id]['fuel_dt']['debtors']:
-            user_data[message.chat.id]['fuel_dt']['debtors'].append({"contractor": "Нет", "volume": 0})
+        if not user_data[message.chat.id].fuel_dt.debtors:
+            user_data[message.chat.id].fuel_dt.debtors.append(Debt("Нет", 0))
         get_summary_block3(message)
 
-@bot.message_handler(func=lambda message: message.text in ["Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно"])
+@router.route(["Продажи за наличные", "Продажи по терминалу", "Всего продано", "Отдали в долг", "Нет, всё верно"], stage='dt')
 def handle_data_correction_block3(message):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
@@ -799,16 +937,16 @@ def handle_data_correction_block3(message):
     if message.text == "Нет, всё верно":
         get_summary_block3(message)
     elif message.text == "Продажи за наличные":
-        bot.send_message(message.chat.id, "Введите новое значение продажи за наличные (в литрах):")
+        wizard.show(message.chat.id, "Введите новое значение продажи за наличные (в литрах):")
         bot.register_next_step_handler(message, update_dt_sold_cash)
     elif message.text == "Продажи по терминалу":
-        bot.send_message(message.chat.id, "Введите новое значение продажи по терминалу (в литрах):")
+        wizard.show(message.chat.id, "Введите новое значение продажи по терминалу (в литрах):")
         bot.register_next_step_handler(message, update_dt_sold_card)
     elif message.text == "Всего продано":
-        bot.send_message(message.chat.id, "Введите новое общее количество проданного (в литрах):")
+        wizard.show(message.chat.id, "Введите новое общее количество проданного (в литрах):")
         bot.register_next_step_handler(message, update_dt_total_sold)
     elif message.text == "Отдали в долг":
-        user_data[message.chat.id]['fuel_dt']['debtors'] = []
+        user_data[message.chat.id].fuel_dt.debtors = []
         select_contractor_dt(message)
 
 def update_dt_sold_cash(message):
@@ -816,18 +954,12 @@ def update_dt_sold_cash(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, update_dt_sold_cash)
         return
-    user_data[message.chat.id]['fuel_dt']['sold_cash'] = message.text
+    user_data[message.chat.id].fuel_dt.sold_cash = int(message.text)
     # Recalculate total_sold if necessary
-    try:
-        sold_cash = int(user_data[message.chat.id]['fuel_dt']['sold_cash'])
-        sold_card = int(user_data[message.chat.id]['fuel_dt']['sold_card'])
-        total_sold = sold_cash + sold_card
-        user_data[message.chat.id]['fuel_dt']['total_sold'] = total_sold
-    except (KeyError, ValueError):
-        pass
+    user_data[message.chat.id].fuel_dt.recalculate_total()
     get_summary_block3(message)
 
 def update_dt_sold_card(message):
@@ -835,18 +967,12 @@ def update_dt_sold_card(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, update_dt_sold_card)
         return
-    user_data[message.chat.id]['fuel_dt']['sold_card'] = message.text
+    user_data[message.chat.id].fuel_dt.sold_card = int(message.text)
     # Recalculate total_sold if necessary
-    try:
-        sold_cash = int(user_data[message.chat.id]['fuel_dt']['sold_cash'])
-        sold_card = int(user_data[message.chat.id]['fuel_dt']['sold_card'])
-        total_sold = sold_cash + sold_card
-        user_data[message.chat.id]['fuel_dt']['total_sold'] = total_sold
-    except (KeyError, ValueError):
-        pass
+    user_data[message.chat.id].fuel_dt.recalculate_total()
     get_summary_block3(message)
 
 def update_dt_total_sold(message):
@@ -854,20 +980,16 @@ def update_dt_total_sold(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
         bot.register_next_step_handler(message, update_dt_total_sold)
         return
-    user_data[message.chat.id]['fuel_dt']['total_sold'] = message.text
+    user_data[message.chat.id].fuel_dt.total_sold = int(message.text)
     get_summary_block3(message)
 
 def select_contractor_dt(message):
-    global contractor1, contractor2, contractor3
-    contractor1 = "Контрагент 1"
-    contractor2 = "Контрагент 2"
-    contractor3 = "Контрагент 3"
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
-    markup.add(contractor1, contractor2, contractor3, "Другой Контрагент", "Нет, больше не отпускали")
-    bot.send_message(message.chat.id, "Выберите Контрагента, получившего топливо в долг или нажмите 'Нет, больше не отпускали':", reply_markup=markup)
+    markup.add(*stations.for_chat(message.chat.id).contractors, "Другой Контрагент", "Нет, больше не отпускали")
+    wizard.show(message.chat.id, "Выберите Контрагента, получившего топливо в долг или нажмите 'Нет, больше не отпускали':", reply_markup=markup)
     bot.register_next_step_handler(message, debt_contractor_dt)
 
 def debt_contractor_dt(message):
@@ -875,11 +997,11 @@ def debt_contractor_dt(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if message.text == "Другой Контрагент":
-        bot.send_message(message.chat.id, "Введите название контрагента: ")
+        wizard.show(message.chat.id, "Введите название контрагента: ")
         bot.register_next_step_handler(message, get_debt_contractor_dt)
     elif message.text == "Нет, больше не отпускали":
-        if not user_data[message.chat.id]['fuel_dt']['debtors']:
-            user_data[message.chat.id]['fuel_dt']['debtors'].append({"contractor": "Нет", "volume": 0})
+        if not user_data[message.chat.id].fuel_dt.debtors:
+            user_data[message.chat.id].fuel_dt.debtors.append(Debt("Нет", 0))
         get_summary_block3(message)
     else:
         add_debtor_dt(message, message.text)
@@ -889,28 +1011,28 @@ def get_debt_contractor_dt(message):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isalpha():
-        bot.send_message(message.chat.id, "Пожалуйста, введите корректное название контрагента: ")
+        wizard.show(message.chat.id, "Пожалуйста, введите корректное название контрагента: ")
         bot.register_next_step_handler(message, get_debt_contractor_dt)
     else:
         add_debtor_dt(message, message.text)
 
 def add_debtor_dt(message, contractor):
-    bot.send_message(message.chat.id, f"Сколько отпущено {contractor} (в литрах): ")
-    bot.register_next_step_handler(message, lambda msg: debt_volume_dt(msg, contractor))
+    wizard.show(message.chat.id, f"Сколько отпущено {contractor} (в литрах): ")
+    bot.register_next_step_handler(message, debt_volume_dt, contractor)
 
 def debt_volume_dt(message, contractor):
     if message.text.startswith('/'):
             handle_commands(message)  # Перенаправляем команды
             return
     if not message.text.isdigit():
-        bot.send_message(message.chat.id, "Пожалуйста, введите числовое значение: ")
-        bot.register_next_step_handler(message, lambda msg: debt_volume_dt(msg, contractor))
+        wizard.show(message.chat.id, "Пожалуйста, введите числовое значение: ")
+        bot.register_next_step_handler(message, debt_volume_dt, contractor)
         return
-    volume = message.text
-    user_data[message.chat.id]['fuel_dt']['debtors'].append({"contractor": contractor, "volume": volume})
+    volume = int(message.text)
+    user_data[message.chat.id].fuel_dt.debtors.append(Debt(contractor, volume))
     markup = ReplyKeyboardMarkup(one_time_keyboard=True, resize_keyboard=True)
     markup.add("Да, еще отпускали в долг", "Нет, больше не отпускали")
-    bot.send_message(message.chat.id, "Отпускали еще ДТ-К5 в долг?", reply_markup=markup)
+    wizard.show(message.chat.id, "Отпускали еще ДТ-К5 в долг?", reply_markup=markup)
     bot.register_next_step_handler(message, still_debt_dt)
 
 def still_debt_dt(message):
@@ -919,5 +1041,91 @@ def still_debt_dt(message):
     else:
         get_summary_block3(message)
 
+# Справочные команды не прерывают отчёт: они обрабатываются до next-step
+# обработчиков, и диалог продолжается с того же шага
+INFO_COMMANDS = {'/debts': debts_command, '/month': month_command}
+
+def info_command(update):
+    message = update.message
+    if message is None or not message.text:
+        return None
+    return INFO_COMMANDS.get(message.text.split(' ')[0])
+
+def process_updates(updates):
+    """Обрабатывает обновления и сохраняет изменённые сессии"""
+    try:
+        for update in updates:
+            command = info_command(update)
+            if command is not None:
+                timed(command, update.message)
+        bot.process_new_updates([update for update in updates if info_command(update) is None])
+    finally:
+        for update in updates:
+            user_data.save(update_chat_id(update))
+
 # Запуск бота
-bot.polling()
\ No newline at end of file
+dispatcher = ChatDispatcher(process_updates, workers=WORKERS)
+dispatcher.start()
+
+# Обработчики из декораторов тоже замеряются; next-step - через step_handler
+for handlers in (bot.message_handlers, bot.callback_query_handlers):
+    for handler in handlers:
+        handler["function"] = functools.partial(timed, handler["function"])
+
+# Метрики читаются только при запросе страницы или снимка
+metrics = MetricsRegistry()
+metrics.histograms("handler_seconds", "Длительность обработчиков обновлений", "handler", handler_latency)
+metrics.histograms("telegram_request_seconds", "Длительность вызовов Telegram Bot API", "method", sender.latency)
+metrics.histograms("telegram_queue_wait_seconds", "Ожидание запроса к Telegram в очереди отправки", None, sender.wait)
+metrics.histograms("sheets_request_seconds", "Длительность вызовов Google API", "operation",
+                   lambda: sheets_session.latency if sheets_session is not None else None)
+metrics.gauge("sessions_active", "Незаконченные отчёты в памяти", lambda: len(user_data))
+metrics.gauge("outbox_pending", "Отчёты в журнале, ещё не записанные в таблицу", outbox.pending_count)
+metrics.gauge("dispatcher_queue_depth", "Необработанные обновления по потокам",
+              lambda: dict(enumerate(dispatcher.backlog())), label="worker")
+metrics.gauge("telegram_queue_depth", "Запросы к Telegram в очереди по потокам отправки",
+              lambda: dict(enumerate(sender.stats()["queue_depth"])), label="worker")
+metrics.gauge("sheets_queue_depth", "Вызовы Google Sheets в очереди планировщика",
+              lambda: sheets_scheduler.stats()["queue_depth"])
+metrics.gauge("sheets_circuit_open", "1 - вызовы Google Sheets приостановлены после ошибок",
+              lambda: int(sheets_scheduler.stats()["state"] == sheets_scheduler.breaker.OPEN))
+if METRICS_PORT:
+    metrics_server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT + CLUSTER_REPLICA)
+    metrics_server.start()
+if METRICS_SNAPSHOT_PATH:
+    metrics_snapshots = SnapshotWriter(metrics, METRICS_SNAPSHOT_PATH.format(replica=CLUSTER_REPLICA),
+                                       interval=METRICS_SNAPSHOT_INTERVAL)
+    metrics_snapshots.start()
+
+def receive_updates(target):
+    """Приём обновлений от Telegram; target - диспетчер или общая очередь реплик (submit)"""
+    if UPDATES_RECORD_PATH:
+        target = UpdateRecorder(UPDATES_RECORD_PATH, target)
+    if RUNTIME_MODE == "async":
+        asyncio.run(AsyncRuntime(bot, target, pool_size=ASYNC_POOL_SIZE).run())
+    elif RUNTIME_MODE == "webhook":
+        webhook_server = WebhookServer(target, WEBHOOK_SECRET, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH)
+        if WEBHOOK_URL:  # Без адреса сервер можно проверять локально, отправляя записанные обновления
+            bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+        webhook_server.serve_forever()
+    else:
+        poll_updates(bot, target)
+
+if CLUSTER_REPLICAS > 1:
+    # Ведущая реплика складывает обновления в общую очередь, каждая реплика берёт из неё свои чаты
+    update_spool = UpdateSpool(os.path.join(CLUSTER_DIR, "updates.sqlite3"), partitions=CLUSTER_REPLICAS)
+    metrics.gauge("spool_backlog", "Обновления в общей очереди реплик по разделам", update_spool.backlog,
+                  label="partition")
+
+    def lead():
+        start_sheets_owner()
+        threading.Thread(target=receive_updates, args=(update_spool,), name="updates-receiver", daemon=True).start()
+
+    # Блокировка держится, пока жив объект: ссылка хранится до конца работы процесса
+    leader_election = LeaderElection(os.path.join(CLUSTER_DIR, "leader.lock"), on_elected=lead)
+    leader_election.start()
+    cluster_member = ClusterMember(update_spool, dispatcher, CLUSTER_DIR, CLUSTER_REPLICA, CLUSTER_REPLICAS, user_data)
+    cluster_member.run()
+else:
+    start_sheets_owner()
+    receive_updates(dispatcher)
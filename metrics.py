@@ -0,0 +1,220 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы корзин длительностей, секунды
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Распределение значений по корзинам, как у гистограмм Prometheus"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Последняя корзина - больше всех границ
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Верхняя граница корзины, в которую попадает квантиль q (None - за последней границей)"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return None
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, seen = {}, 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                cumulative[bound] = seen
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "buckets": cumulative,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Histograms:
+    """Гистограммы по имени операции, создаются при первом наблюдении"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: histogram.snapshot() for name, histogram in sorted(histograms.items())}
+
+
+def _label(name, value):
+    value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return f'{name}="{value}"'
+
+
+def _labels(*pairs):
+    pairs = [_label(name, value) for name, value in pairs if name is not None]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class MetricsRegistry:
+    """Метрики бота для страницы Prometheus и JSON-снимков.
+
+    Гистограммы регистрируются готовыми объектами Histograms с меткой по имени
+    операции; source может быть и функцией, если объект появляется позже
+    (сессия Google создаётся при подключении). Датчики - функции, которые
+    читаются только при запросе страницы или снимка: горячий путь за экспорт
+    не платит. Датчик возвращает число или словарь {значение метки: число}.
+    """
+
+    def __init__(self, prefix="azs_bot"):
+        self.prefix = prefix
+        self._histograms = []  # (имя, описание, метка, источник)
+        self._gauges = []  # (имя, описание, метка, функция)
+
+    def histograms(self, name, help, label, source):
+        self._histograms.append((f"{self.prefix}_{name}", help, label, source))
+        return source
+
+    def gauge(self, name, help, read, label=None):
+        self._gauges.append((f"{self.prefix}_{name}", help, label, read))
+
+    def _histogram_values(self, source):
+        histograms = source() if callable(source) else source
+        if histograms is None:
+            return {}
+        if isinstance(histograms, Histogram):
+            return {None: histograms.snapshot()}
+        return histograms.snapshot()
+
+    def _gauge_values(self, name, read):
+        try:
+            value = read()
+        except Exception as e:
+            print(f"Ошибка чтения метрики {name}: {e}")
+            return {}
+        return value if isinstance(value, dict) else {None: value}
+
+    def render(self):
+        """Страница в текстовом формате Prometheus"""
+        lines = []
+        for name, help, label, source in self._histograms:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            for value, snapshot in self._histogram_values(source).items():
+                pair = (label, value) if value is not None else (None, None)
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{name}_bucket{_labels(pair, ('le', bound))} {count}")
+                lines.append(f"{name}_bucket{_labels(pair, ('le', '+Inf'))} {snapshot['count']}")
+                lines.append(f"{name}_sum{_labels(pair)} {snapshot['sum']}")
+                lines.append(f"{name}_count{_labels(pair)} {snapshot['count']}")
+        for name, help, label, read in self._gauges:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for value, number in self._gauge_values(name, read).items():
+                pair = (label, value) if value is not None else (None, None)
+                lines.append(f"{name}{_labels(pair)} {number}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Все метрики одним словарём для JSON"""
+        return {
+            "time": round(time.time(), 3),
+            "histograms": {name: {str(value): snapshot for value, snapshot in self._histogram_values(source).items()}
+                           for name, _, _, source in self._histograms},
+            "gauges": {name: {str(value): number for value, number in self._gauge_values(name, read).items()}
+                       for name, _, _, read in self._gauges},
+        }
+
+
+class MetricsServer:
+    """HTTP-страница метрик для Prometheus (GET path)"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9100, path="/metrics"):
+        self.registry = registry
+        self.path = path
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True).start()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != server.path:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = server.registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+class SnapshotWriter:
+    """Раз в interval секунд записывает снимок метрик в JSON-файл (заменой файла целиком)"""
+
+    def __init__(self, registry, path, interval=60):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        threading.Thread(target=self._run, name="metrics-snapshot", daemon=True).start()
+
+    def write(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.registry.snapshot(), f, ensure_ascii=False)
+        os.replace(temporary, self.path)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Ошибка записи снимка метрик: {e}")
@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class Outbox:
+    """Локальный журнал отчётов (SQLite, WAL): строка фиксируется на диске до записи в Google Sheets"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " row TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt_at REAL NOT NULL DEFAULT 0,"
+                " delivered_at REAL,"
+                " sheet_row INTEGER)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (delivered_at, id)"
+            )
+            # Ключ идемпотентности, станция, дата отчёта и лист станции; журналы старых версий дополняются
+            columns = {column[1] for column in self._conn.execute("PRAGMA table_info(outbox)")}
+            for column in ("idem_key", "station", "report_date", "worksheet"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} TEXT")
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS outbox_idem_key ON outbox (idem_key)")
+
+    def add(self, row, key=None, station=None, date=None, worksheet=None):
+        """Фиксирует строку отчёта и возвращает её номер в журнале; None - отчёт с таким ключом уже есть.
+
+        worksheet - название листа станции, None - основной лист.
+        """
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO outbox (row, created_at, idem_key, station, report_date, worksheet)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (json.dumps(row, ensure_ascii=False), time.time(), key,
+                     None if station is None else str(station), date, worksheet),
+                )
+                return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+    def entries_after(self, entry_id, limit=1000):
+        """Записи журнала с номером больше entry_id: [(id, станция, row)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, station, row FROM outbox WHERE id > ? ORDER BY id LIMIT ?", (entry_id, limit)
+            ).fetchall()
+        return [(entry_id, station, json.loads(row)) for entry_id, station, row in rows]
+
+    def keys(self, after=0):
+        """Сохранённые отчёты с номером больше after: [(id, ключ, станция, дата)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, idem_key, station, report_date FROM outbox WHERE id > ? AND idem_key IS NOT NULL"
+                " ORDER BY id", (after,)
+            ).fetchall()
+
+    def pending(self, limit, now=None):
+        """Недоставленные строки, для которых подошло время попытки: [(id, row, created_at, worksheet)]"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, row, created_at, worksheet FROM outbox"
+                " WHERE delivered_at IS NULL AND next_attempt_at <= ?"
+                " ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        return [(entry_id, json.loads(row), created_at, worksheet) for entry_id, row, created_at, worksheet in rows]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE delivered_at IS NULL"
+            ).fetchone()[0]
+
+    def next_attempt_at(self):
+        """Время ближайшей попытки доставки или None, если журнал пуст"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE delivered_at IS NULL"
+            ).fetchone()[0]
+
+    def mark_delivered(self, ids, first_row):
+        """Отмечает строки доставленными; first_row - строка листа, куда попала первая из них (None - неизвестна)"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET delivered_at = ?, sheet_row = ? WHERE id = ?",
+                [(now, None if first_row is None else first_row + offset, entry_id)
+                 for offset, entry_id in enumerate(ids)],
+            )
+
+    def mark_failed(self, ids, retry_base, retry_max):
+        """Откладывает следующую попытку с экспоненциальной задержкой, возвращает задержку"""
+        placeholders = ",".join("?" * len(ids))
+        with self._lock, self._conn:
+            attempts = self._conn.execute(
+                f"SELECT MAX(attempts) FROM outbox WHERE id IN ({placeholders})", ids
+            ).fetchone()[0] or 0
+            delay = min(retry_max, retry_base * 2 ** attempts)
+            self._conn.execute(
+                f"UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id IN ({placeholders})",
+                [time.time() + delay, *ids],
+            )
+        return delay
@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from gspread.exceptions import APIError
+from gspread.utils import ValueRenderOption, rowcol_to_a1
+
+from report import Report
+from sheets_scheduler import PRIORITY_READ
+
+
+def day_key(date):
+    """"18.10.2026" -> "2026-10-18" для сортировки и выборок по периоду; None, если это не дата"""
+    try:
+        return datetime.strptime(str(date), "%d.%m.%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+class ReportReplica:
+    """Локальная копия строк листов отчётов (SQLite) с индексами по дате, оператору и контрагенту.
+
+    Строки хранятся по листу и номеру строки, поэтому повторная запись той же
+    строки (своя запись и затем синхронизация хвоста) ничего не дублирует.
+    Лист None - основной, остальные - листы станций; выборки идут по всем листам.
+    Строки, в первой ячейке которых нет даты (заголовок, заметки), не копируются.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {column[1] for column in self._conn.execute("PRAGMA table_info(reports)")}
+            if columns and "worksheet" not in columns:
+                # Копия старой версии - только основного листа: перечитаем все листы заново
+                self._conn.execute("DROP TABLE reports")
+                self._conn.execute("DROP TABLE IF EXISTS debts")
+                self._conn.execute("DROP TABLE IF EXISTS meta")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                " worksheet TEXT NOT NULL,"  # "" - основной лист
+                " sheet_row INTEGER NOT NULL,"
+                " date TEXT,"
+                " day TEXT,"
+                " operator TEXT,"
+                " row TEXT NOT NULL,"
+                " PRIMARY KEY (worksheet, sheet_row))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_day ON reports (day)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_operator ON reports (operator, day)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS debts ("
+                " worksheet TEXT NOT NULL,"
+                " sheet_row INTEGER NOT NULL,"
+                " fuel TEXT NOT NULL,"
+                " contractor TEXT NOT NULL,"
+                " volume REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS debts_contractor ON debts (contractor)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS debts_row ON debts (worksheet, sheet_row)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+    # --- запись ---
+
+    def apply(self, first_row, rows, worksheet=None):
+        """Записывает строки листа worksheet, начиная с номера first_row"""
+        with self._lock, self._conn:
+            for sheet_row, row in enumerate(rows, first_row):
+                self._put(worksheet or "", sheet_row, row)
+
+    def _put(self, worksheet, sheet_row, row):
+        key = (worksheet, sheet_row)
+        self._conn.execute("DELETE FROM debts WHERE worksheet = ? AND sheet_row = ?", key)
+        report = Report.from_row(row) if row and day_key(row[0]) is not None else None
+        if report is None:  # Пустая строка, заголовок или заметка - не отчёт
+            self._conn.execute("DELETE FROM reports WHERE worksheet = ? AND sheet_row = ?", key)
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO reports (worksheet, sheet_row, date, day, operator, row)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, str(report.date), day_key(report.date), str(report.operator),
+             json.dumps(list(row), ensure_ascii=False)),
+        )
+        for fuel, block in (("ai92", report.fuel_ai92), ("dt", report.fuel_dt)):
+            for debtor in block.debtors:
+                if debtor.volume:  # "Нет - 0 л." - долга не было
+                    self._conn.execute(
+                        "INSERT INTO debts (worksheet, sheet_row, fuel, contractor, volume) VALUES (?, ?, ?, ?, ?)",
+                        (*key, fuel, debtor.contractor, debtor.volume),
+                    )
+
+    def synced_row(self, worksheet=None):
+        """Последняя строка листа, до которой копия сверена с Google"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (self._synced_key(worksheet),)).fetchone()
+        return row[0] if row else 0
+
+    def set_synced_row(self, sheet_row, worksheet=None):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               (self._synced_key(worksheet), sheet_row))
+
+    @staticmethod
+    def _synced_key(worksheet):
+        return "synced_row" if worksheet is None else f"synced_row:{worksheet}"
+
+    def clear(self):
+        """Забывает все строки: следующая синхронизация перечитает лист целиком"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reports")
+            self._conn.execute("DELETE FROM debts")
+            self._conn.execute("DELETE FROM meta")
+
+    # --- чтение ---
+
+    def reports_on(self, date):
+        """Строки отчётов за дату "дд.мм.гггг" """
+        return self._rows("SELECT row FROM reports WHERE day = ? ORDER BY worksheet, sheet_row", (day_key(date),))
+
+    def has_report(self, date):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM reports WHERE day = ? LIMIT 1", (day_key(date),)).fetchone()
+        return row is not None
+
+    def reports_by_operator(self, operator, since=None, until=None):
+        """Строки отчётов оператора, необязательно за период дат "дд.мм.гггг" включительно"""
+        query, params = "SELECT row FROM reports WHERE operator = ?", [operator]
+        query, params = self._period(query, params, "day", since, until)
+        return self._rows(query + " ORDER BY day, worksheet, sheet_row", params)
+
+    def debts_of(self, contractor, since=None, until=None):
+        """Долги контрагента: [(дата, топливо, литры)]"""
+        query = ("SELECT reports.date, debts.fuel, debts.volume FROM debts"
+                 " JOIN reports ON reports.worksheet = debts.worksheet AND reports.sheet_row = debts.sheet_row"
+                 " WHERE debts.contractor = ?")
+        query, params = self._period(query, [contractor], "reports.day", since, until)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY reports.day, debts.worksheet, debts.sheet_row",
+                                      params).fetchall()
+
+    def _period(self, query, params, column, since, until):
+        if since is not None:
+            query += f" AND {column} >= ?"
+            params.append(day_key(since))
+        if until is not None:
+            query += f" AND {column} <= ?"
+            params.append(day_key(until))
+        return query, params
+
+    def _rows(self, query, params):
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row) for row, in rows]
+
+
+class ReplicaSync:
+    """Периодически дочитывает хвосты листов в копию через очередь Google Sheets с низким приоритетом.
+
+    Свои записи бот кладёт в копию сразу (apply); синхронизация подхватывает
+    строки, дописанные в таблицу в обход бота. Читаются основной лист и листы
+    titles (листы станций) из пула worksheets.
+    """
+
+    def __init__(self, replica, worksheets, scheduler, titles=(), interval=300, chunk=1000):
+        self.replica = replica
+        self.worksheets = worksheets
+        self.titles = tuple(titles)
+        self.scheduler = scheduler
+        self.interval = interval
+        self.chunk = chunk
+        self._thread = threading.Thread(target=self._run, name="replica-sync", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def sync(self):
+        """Дочитывает хвосты всех листов; возвращает число прочитанных строк"""
+        return sum(self.sync_tail(title) for title in (None, *self.titles))
+
+    def sync_tail(self, title=None):
+        """Читает строки листа title после synced_row до конца листа; возвращает число прочитанных строк"""
+        worksheet = self.worksheets.get(title)
+        total = 0
+        while True:
+            start = self.replica.synced_row(title) + 1
+            try:
+                # Числа без форматирования - в том же виде, в каком бот их записывает
+                rows = self.scheduler.call(worksheet.get, self._range(worksheet, start),
+                                           value_render_option=ValueRenderOption.unformatted,
+                                           priority=PRIORITY_READ)
+            except APIError as e:
+                if "exceeds grid limits" in str(e):
+                    return total  # Новых строк нет, а лист кончается на synced_row
+                raise
+            rows = list(rows)
+            if rows:
+                self.replica.apply(start, rows, title)
+                self.replica.set_synced_row(start + len(rows) - 1, title)
+                total += len(rows)
+            if len(rows) < self.chunk:
+                return total
+
+    def _range(self, worksheet, start):
+        """Диапазон очередной порции в пределах сетки листа: за её край Google отвечает ошибкой.
+
+        row_count из метаданных листа может отстать (строки дописываются вставкой),
+        поэтому порцию, которая выходит за известный край, читаем до конца листа.
+        """
+        end = start + self.chunk - 1
+        last_cell = rowcol_to_a1(min(end, worksheet.row_count), worksheet.col_count)
+        if end <= worksheet.row_count:
+            return f"A{start}:{last_cell}"
+        return f"A{start}:{last_cell.rstrip('0123456789')}"
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Ошибка синхронизации копии таблицы: {e}")
+            time.sleep(self.interval)
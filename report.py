@@ -0,0 +1,165 @@
+DEBTOR_COLUMNS = 5  # Столбцов под должников каждого вида топлива в таблице
+DEBTOR_SEPARATOR = "; "  # Должники сверх DEBTOR_COLUMNS пишутся в последний столбец через разделитель
+FUEL_NAMES = {"ai92": "АИ-92-К5", "dt": "ДТ-К5"}  # Ключи видов топлива в локальных хранилищах
+
+
+class Debt:
+    """Топливо, отпущенное контрагенту в долг"""
+
+    __slots__ = ("contractor", "volume")
+
+    def __init__(self, contractor, volume):
+        self.contractor = contractor
+        self.volume = volume
+
+    def __str__(self):
+        return f"{self.contractor} - {self.volume} л."
+
+    def to_dict(self):
+        return {"contractor": self.contractor, "volume": self.volume}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["contractor"], data["volume"])
+
+    @classmethod
+    def parse(cls, text):
+        """Разбирает ячейку таблицы "Контрагент - 30 л."; None для пустой или чужой ячейки"""
+        contractor, sep, volume = str(text).rpartition(" - ")
+        if not sep or not volume.endswith(" л."):
+            return None
+        volume = volume[:-len(" л.")]
+        try:
+            volume = float(volume.replace(",", "."))
+        except ValueError:
+            return None
+        return cls(contractor, int(volume) if volume.is_integer() else volume)
+
+
+class FuelBlock:
+    """Данные отчёта по одному виду топлива, литры"""
+
+    __slots__ = ("counter", "sold_cash", "sold_card", "total_sold", "debtors")
+
+    def __init__(self, counter=None, sold_cash=None, sold_card=None, total_sold=None, debtors=None):
+        self.counter = counter
+        self.sold_cash = sold_cash
+        self.sold_card = sold_card
+        self.total_sold = total_sold
+        self.debtors = debtors if debtors is not None else []
+
+    def recalculate_total(self):
+        """Пересчитывает общий объём продаж, если известны наличные и терминал"""
+        if self.sold_cash is not None and self.sold_card is not None:
+            self.total_sold = self.sold_cash + self.sold_card
+        return self.total_sold
+
+    def debtor_columns(self):
+        """Должники для столбцов таблицы, дополненные пустыми строками до DEBTOR_COLUMNS"""
+        debtors = [str(debtor) for debtor in self.debtors]
+        if len(debtors) > DEBTOR_COLUMNS:
+            # Лишние должники не теряются, а делят последний столбец
+            debtors[DEBTOR_COLUMNS - 1:] = [DEBTOR_SEPARATOR.join(debtors[DEBTOR_COLUMNS - 1:])]
+        return debtors + [''] * (DEBTOR_COLUMNS - len(debtors))
+
+    def to_dict(self):
+        return {
+            "counter": self.counter,
+            "sold_cash": self.sold_cash,
+            "sold_card": self.sold_card,
+            "total_sold": self.total_sold,
+            "debtors": [debtor.to_dict() for debtor in self.debtors],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["counter"], data["sold_cash"], data["sold_card"], data["total_sold"],
+                   [Debt.from_dict(debtor) for debtor in data["debtors"]])
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Блок из ячеек строки таблицы: наличные, терминал, всего и столбцы должников"""
+        cells = list(cells) + [''] * (3 + DEBTOR_COLUMNS - len(cells))
+        debtors = [Debt.parse(text) for cell in cells[3:3 + DEBTOR_COLUMNS]
+                   for text in str(cell).split(DEBTOR_SEPARATOR)]
+        return cls(None, cells[0], cells[1], cells[2], [debtor for debtor in debtors if debtor is not None])
+
+
+class Report:
+    """Отчёт АЗС за день, собираемый в диалоге с оператором"""
+
+    __slots__ = ("state", "stage", "date", "operator", "temperature", "comments", "fuel_ai92", "fuel_dt",
+                 "wizard_message_id", "wizard_step", "wizard_options")
+
+    def __init__(self, state='start', date=None, operator=None, temperature=None, comments=None,
+                 fuel_ai92=None, fuel_dt=None, stage='general'):
+        self.state = state  # Possible states: 'start', 'creating_report', 'correcting_data'
+        self.stage = stage  # Раздел отчёта: 'general', 'ai92', 'dt'
+        self.date = date
+        self.operator = operator
+        self.temperature = temperature
+        self.comments = comments
+        self.fuel_ai92 = fuel_ai92
+        self.fuel_dt = fuel_dt
+        # Режим мастера: редактируемое сообщение, номер шага и тексты его кнопок
+        self.wizard_message_id = None
+        self.wizard_step = 0
+        self.wizard_options = []
+
+    def to_row(self):
+        """Строка листа "АЗС Отчёты" - единственный способ записи отчёта в таблицу"""
+        return [
+            self.date,
+            self.operator,
+            self.temperature,
+            self.comments,
+            self.fuel_ai92.sold_cash,
+            self.fuel_ai92.sold_card,
+            self.fuel_ai92.total_sold,
+            *self.fuel_ai92.debtor_columns(),
+            self.fuel_dt.sold_cash,
+            self.fuel_dt.sold_card,
+            self.fuel_dt.total_sold,
+            *self.fuel_dt.debtor_columns(),
+            # Показания счётчиков - после обоих блоков, чтобы не сдвигать прежние столбцы листа
+            self.fuel_ai92.counter,
+            self.fuel_dt.counter,
+        ]
+
+    @classmethod
+    def from_row(cls, row):
+        """Отчёт из строки листа (обратное to_row); в старых строках показаний счётчиков нет - None"""
+        block = 3 + DEBTOR_COLUMNS
+        counters = 4 + 2 * block
+        row = list(row) + [''] * (counters + 2 - len(row))
+        fuel_ai92 = FuelBlock.from_cells(row[4:4 + block])
+        fuel_dt = FuelBlock.from_cells(row[4 + block:counters])
+        fuel_ai92.counter = None if row[counters] in ('', None) else row[counters]
+        fuel_dt.counter = None if row[counters + 1] in ('', None) else row[counters + 1]
+        return cls(date=row[0], operator=row[1], temperature=row[2], comments=row[3],
+                   fuel_ai92=fuel_ai92, fuel_dt=fuel_dt)
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "stage": self.stage,
+            "date": self.date,
+            "operator": self.operator,
+            "temperature": self.temperature,
+            "comments": self.comments,
+            "fuel_ai92": self.fuel_ai92.to_dict() if self.fuel_ai92 else None,
+            "fuel_dt": self.fuel_dt.to_dict() if self.fuel_dt else None,
+            "wizard": [self.wizard_message_id, self.wizard_step, self.wizard_options],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        report = cls(
+            data["state"], data["date"], data["operator"], data["temperature"], data["comments"],
+            FuelBlock.from_dict(data["fuel_ai92"]) if data["fuel_ai92"] else None,
+            FuelBlock.from_dict(data["fuel_dt"]) if data["fuel_dt"] else None,
+            data.get("stage", 'general'),
+        )
+        if "wizard" in data:
+            report.wizard_message_id, report.wizard_step, report.wizard_options = data["wizard"]
+        return report
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import threading
+
+NEW = "new"
+DUPLICATE = "duplicate"  # Тот же отчёт уже сохранён
+CONFLICT = "conflict"  # За эту дату станция уже сохранила отчёт с другими данными
+
+
+def report_key(station, date, row):
+    """Ключ идемпотентности отчёта: станция, дата и содержимое строки"""
+    payload = json.dumps([str(station), date, row], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class ReportIndex:
+    """Ключи сохранённых отчётов в памяти: дубли и конфликты по дате находятся без обращения к Google.
+
+    Заполняется из локального журнала (catch_up): при старте целиком, затем
+    дочитываются только новые записи, в том числе сделанные другими процессами.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._dates = set()
+        self.last_entry = 0
+        self._lock = threading.Lock()
+
+    def catch_up(self, outbox):
+        for entry_id, key, station, date in outbox.keys(after=self.last_entry):
+            self.add(key, station, date)
+            self.last_entry = max(self.last_entry, entry_id)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, station, date):
+        with self._lock:
+            self._keys.add(key)
+            self._dates.add((str(station), date))
+
+    def check(self, key, station, date):
+        with self._lock:
+            if key in self._keys:
+                return DUPLICATE
+            if (str(station), date) in self._dates:
+                return CONFLICT
+            return NEW
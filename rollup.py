@@ -0,0 +1,158 @@
+import threading
+import time
+
+from gspread.exceptions import APIError
+from gspread.utils import rowcol_to_a1
+
+from replica import day_key
+from report import FUEL_NAMES, Report
+from sheets_scheduler import PRIORITY_WRITE
+
+SUMMARY_FIELDS = ("sold_cash", "sold_card", "total_sold", "debt")
+SUMMARY_FIELD_NAMES = ("наличные", "терминал", "всего", "в долг")
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else 0
+
+
+def _round(value):
+    value = round(value, 3)
+    return int(value) if float(value).is_integer() else value
+
+
+class Aggregate:
+    """Итоги за период: литры по видам топлива и способу оплаты, диапазон температур"""
+
+    def __init__(self):
+        self.reports = 0
+        self.litres = {fuel: dict.fromkeys(SUMMARY_FIELDS, 0) for fuel in FUEL_NAMES}
+        self.temperature_min = None
+        self.temperature_max = None
+
+    def add(self, report):
+        self.reports += 1
+        for fuel, block in (("ai92", report.fuel_ai92), ("dt", report.fuel_dt)):
+            litres = self.litres[fuel]
+            litres["sold_cash"] += _number(block.sold_cash)
+            litres["sold_card"] += _number(block.sold_card)
+            litres["total_sold"] += _number(block.total_sold)
+            litres["debt"] += sum(_number(debtor.volume) for debtor in block.debtors)
+        temperature = report.temperature
+        if isinstance(temperature, (int, float)):
+            if self.temperature_min is None or temperature < self.temperature_min:
+                self.temperature_min = temperature
+            if self.temperature_max is None or temperature > self.temperature_max:
+                self.temperature_max = temperature
+
+    def to_cells(self):
+        cells = [self.reports]
+        for fuel in FUEL_NAMES:
+            cells.extend(_round(self.litres[fuel][field]) for field in SUMMARY_FIELDS)
+        cells.append("" if self.temperature_min is None else self.temperature_min)
+        cells.append("" if self.temperature_max is None else self.temperature_max)
+        return cells
+
+
+def summary_header(period):
+    header = [period, "Отчётов"]
+    for name in FUEL_NAMES.values():
+        header.extend(f"{name}, {field}" for field in SUMMARY_FIELD_NAMES)
+    return header + ["Мин. t", "Макс. t"]
+
+
+SUMMARY_WIDTH = len(summary_header(""))
+MONTH_COLUMN = SUMMARY_WIDTH + 2  # Таблица по месяцам - справа от таблицы по дням через пустой столбец
+
+
+class Rollups:
+    """Итоги по дням и месяцам в памяти, пополняются каждым сохранённым отчётом.
+
+    Как и DebtLedger, записи журнала учитываются по возрастанию номера; при
+    старте итоги пересчитываются из журнала целиком (catch_up).
+    """
+
+    def __init__(self):
+        self.days = {}  # "2026-10-18" -> Aggregate
+        self.months = {}  # "2026-10" -> Aggregate
+        self.last_entry = 0
+        self.version = 0  # Растёт с каждым учтённым отчётом, по нему RollupWriter видит изменения
+        self._lock = threading.Lock()
+
+    def record(self, entry_id, row):
+        report = Report.from_row(row)
+        day = day_key(report.date)
+        with self._lock:
+            if entry_id <= self.last_entry:
+                return
+            self.last_entry = entry_id
+            if day is None:
+                return  # Строка без даты в итоги не попадает
+            self.days.setdefault(day, Aggregate()).add(report)
+            self.months.setdefault(day[:7], Aggregate()).add(report)
+            self.version += 1
+
+    def catch_up(self, outbox):
+        """Учитывает записи журнала, сохранённые после last_entry"""
+        while True:
+            entries = outbox.entries_after(self.last_entry)
+            if not entries:
+                return
+            for entry_id, _, row in entries:
+                self.record(entry_id, row)
+
+    def month(self, year, month):
+        """Итоги за месяц или None, если отчётов не было"""
+        with self._lock:
+            return self.months.get(f"{year:04d}-{month:02d}")
+
+    def tables(self):
+        """(версия, таблица по дням, таблица по месяцам) для листа сводки"""
+        with self._lock:
+            days = [[f"{key[8:10]}.{key[5:7]}.{key[:4]}"] + aggregate.to_cells()
+                    for key, aggregate in sorted(self.days.items())]
+            months = [[f"{key[5:7]}.{key[:4]}"] + aggregate.to_cells()
+                      for key, aggregate in sorted(self.months.items())]
+            return self.version, days, months
+
+
+class RollupWriter:
+    """Переписывает лист сводки, когда итоги изменились: по одной записи диапазона на таблицу дней и месяцев"""
+
+    def __init__(self, rollups, outbox, worksheets, scheduler, title, interval=60):
+        self.rollups = rollups
+        self.outbox = outbox
+        self.worksheets = worksheets
+        self.scheduler = scheduler
+        self.title = title
+        self.interval = interval
+        self.written_version = 0
+        self._thread = threading.Thread(target=self._run, name="rollup-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def flush(self):
+        """Записывает итоги, если они изменились с прошлой записи"""
+        self.rollups.catch_up(self.outbox)  # Отчёты, сохранённые другими процессами с тем же журналом
+        version, days, months = self.rollups.tables()
+        if version == self.written_version:
+            return
+        worksheet = self.worksheets.get(self.title)
+        if len(days) + 1 > worksheet.row_count:
+            self.scheduler.call(worksheet.resize, rows=len(days) + 366, priority=PRIORITY_WRITE)
+        self.scheduler.call(worksheet.update, values=[summary_header("Дата")] + days,
+                            range_name="A1", priority=PRIORITY_WRITE)
+        self.scheduler.call(worksheet.update, values=[summary_header("Месяц")] + months,
+                            range_name=rowcol_to_a1(1, MONTH_COLUMN), priority=PRIORITY_WRITE)
+        self.written_version = version
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                if isinstance(e, APIError):
+                    self.worksheets.invalidate(self.title)  # Лист сводки могли переименовать или удалить
+                print(f"Ошибка записи сводки: {e}")
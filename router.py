@@ -0,0 +1,26 @@
+class Router:
+    """Таблица обработчиков кнопок: (этап диалога, текст) -> обработчик.
+
+    Обработчик ищется одним обращением к словарю вместо перебора предикатов.
+    Маршрут без этапа (stage=None) срабатывает на любом этапе, если для
+    текущего этапа нет своего маршрута.
+    """
+
+    def __init__(self):
+        self._routes = {}
+
+    def route(self, texts, stage=None):
+        def decorator(handler):
+            for text in texts:
+                key = (stage, text)
+                if key in self._routes:
+                    raise ValueError(f"Кнопка {text!r} уже обрабатывается на этапе {stage!r}")
+                self._routes[key] = handler
+            return handler
+        return decorator
+
+    def resolve(self, stage, text):
+        handler = self._routes.get((stage, text))
+        if handler is None and stage is not None:
+            handler = self._routes.get((None, text))
+        return handler
@@ -0,0 +1,54 @@
+import re
+import threading
+
+from sheets_scheduler import PRIORITY_WRITE
+
+# 'АЗС Отчёты'!A12:T13 -> 12, 13
+_UPDATED_RANGE = re.compile(r"^[A-Z]+(\d+)(?::[A-Z]+(\d+))?$")
+
+
+def parse_updated_range(response):
+    """Возвращает первую и последнюю строку из ответа values.append"""
+    updated_range = response["updates"]["updatedRange"]
+    match = _UPDATED_RANGE.match(updated_range.rsplit("!", 1)[-1])
+    if not match:
+        raise ValueError(f"Не удалось разобрать диапазон: {updated_range}")
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    return first, last
+
+
+class RowCursor:
+    """Хвост листа, отслеживаемый локально вместо чтения всей колонки дат"""
+
+    def __init__(self, worksheet, scheduler):
+        self.worksheet = worksheet
+        self.scheduler = scheduler
+        self.next_row = None
+        self.conflicts = 0
+        self._lock = threading.Lock()
+
+    def append(self, rows):
+        """Дописывает строки в конец таблицы и возвращает номер первой из них.
+
+        None - строки записаны, но ответ Google не удалось разобрать: номер неизвестен.
+        """
+        with self._lock:
+            # Google сам выбирает строку (INSERT_ROWS), поэтому две записи не попадут в одну строку
+            response = self.scheduler.call(
+                self.worksheet.append_rows, rows, priority=PRIORITY_WRITE,
+                insert_data_option="INSERT_ROWS", table_range="A1",
+            )
+            # Запись уже состоялась: ошибка разбора не должна вести к повтору и дублю строк
+            try:
+                first, last = parse_updated_range(response)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Строки записаны, но номер строки не разобран: {e!r}")
+                self.next_row = None
+                return None
+            if self.next_row is not None and first != self.next_row:
+                # Кто-то дописал или удалил строки в обход бота
+                self.conflicts += 1
+                print(f"Конфликт строк: ожидалась строка {self.next_row}, записано с {first}")
+            self.next_row = last + 1
+            return first
@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from telebot.apihelper import ApiTelegramException
+
+from metrics import Histogram, Histograms
+from sheets_scheduler import TokenBucket
+
+MESSAGE_LIMIT = 4096  # Максимальная длина текста сообщения Telegram
+
+
+class _Request:
+    __slots__ = ("chat_id", "method", "args", "kwargs", "futures", "limited", "queued_at", "attempts")
+
+    def __init__(self, chat_id, method, args, kwargs, limited):
+        self.chat_id = chat_id
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.futures = [Future()]
+        self.limited = limited
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+    def plain_text(self):
+        """Текст без клавиатуры и параметров - такие сообщения можно склеивать"""
+        return (self.method == "send_message" and len(self.args) == 2
+                and all(value is None for value in self.kwargs.values()))
+
+
+class _Shard:
+    def __init__(self):
+        self.requests = deque()
+        self.cond = threading.Condition()
+        self.buckets = {}  # chat_id -> TokenBucket
+        self.blocked_until = {}  # chat_id -> время окончания паузы после 429
+
+
+class SendQueue:
+    """Очередь исходящих запросов к Telegram с ограничением частоты.
+
+    Общее ведро токенов держит лимит бота, ведро каждого чата - лимит чата;
+    ответ 429 приостанавливает чат на retry_after секунд. Запросы одного чата
+    выполняются по порядку в одном потоке, подряд идущие простые тексты
+    склеиваются в одно сообщение. Методы возвращают Future с ответом Telegram.
+    Длительность вызовов попадает в гистограмму latency по методу, время в
+    очереди - в гистограмму wait.
+    """
+
+    def __init__(self, bot, workers=4, rate=30, chat_rate=1, chat_burst=5, max_retries=5):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate, rate)
+        self._bucket_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._sent = 0
+        self._coalesced = 0
+        self._retried = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self.latency = Histograms()
+        self.wait = Histogram()
+        self._shards = [_Shard() for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._work, args=(shard,), name=f"sender-{index}", daemon=True)
+            for index, shard in enumerate(self._shards)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    # --- методы бота ---
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self._submit(chat_id, "send_message", (chat_id, text), kwargs)
+
+    def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        return self._submit(chat_id, "edit_message_text", (text, chat_id, message_id), kwargs)
+
+    def edit_message_reply_markup(self, chat_id, message_id, **kwargs):
+        return self._submit(chat_id, "edit_message_reply_markup", (chat_id, message_id), kwargs)
+
+    def delete_message(self, chat_id, message_id):
+        return self._submit(chat_id, "delete_message", (chat_id, message_id), {})
+
+    def answer_callback_query(self, chat_id, callback_query_id, text=None):
+        # Ответ на нажатие не считается сообщением и не расходует лимиты
+        return self._submit(chat_id, "answer_callback_query", (callback_query_id, text), {}, limited=False)
+
+    def stats(self):
+        with self._stats_lock:
+            sent, wait_total = self._sent, self._wait_total
+            stats = {
+                "sent": sent,
+                "coalesced": self._coalesced,
+                "retried": self._retried,
+                "wait_avg": round(wait_total / sent, 3) if sent else 0.0,
+                "wait_max": round(self._wait_max, 3),
+            }
+        stats["queue_depth"] = [len(shard.requests) for shard in self._shards]
+        now = time.monotonic()
+        stats["chats_blocked"] = sum(1 for shard in self._shards
+                                     for until in list(shard.blocked_until.values()) if until > now)
+        return stats
+
+    def _submit(self, chat_id, method, args, kwargs, limited=True):
+        request = _Request(chat_id, method, args, kwargs, limited)
+        shard = self._shards[hash(chat_id) % len(self._shards)]
+        with shard.cond:
+            shard.requests.append(request)
+            shard.cond.notify()
+        return request.futures[0]
+
+    # --- обработка ---
+
+    def _chat_wait(self, shard, request, now):
+        """Сколько секунд чат запроса должен ждать; 0 - токен чата уже взят"""
+        blocked = shard.blocked_until.get(request.chat_id, 0) - now
+        if blocked > 0:
+            return blocked
+        if not request.limited:
+            return 0.0
+        bucket = shard.buckets.get(request.chat_id)
+        if bucket is None:
+            if len(shard.buckets) > 10000:
+                self._forget_idle(shard)
+            bucket = shard.buckets[request.chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket.try_take()
+
+    def _forget_idle(self, shard):
+        for chat_id, bucket in list(shard.buckets.items()):
+            bucket._refill()
+            if bucket.tokens >= bucket.capacity:
+                del shard.buckets[chat_id]
+        now = time.monotonic()
+        for chat_id, until in list(shard.blocked_until.items()):
+            if until <= now:
+                del shard.blocked_until[chat_id]
+
+    def _next_request(self, shard):
+        """Первый запрос, чат которого может отправлять; остальные чаты шарда не ждут его"""
+        with shard.cond:
+            while True:
+                now = time.monotonic()
+                wait = None
+                waiting_chats = set()
+                for request in shard.requests:
+                    if request.chat_id in waiting_chats:
+                        continue  # Порядок внутри чата сохраняется
+                    chat_wait = self._chat_wait(shard, request, now)
+                    if not chat_wait:
+                        shard.requests.remove(request)
+                        if request.plain_text():
+                            self._coalesce(shard, request)
+                        return request
+                    waiting_chats.add(request.chat_id)
+                    wait = chat_wait if wait is None else min(wait, chat_wait)
+                shard.cond.wait(wait)
+
+    def _coalesce(self, shard, request):
+        """Присоединяет к тексту следующие простые тексты того же чата"""
+        for queued in list(shard.requests):
+            if queued.chat_id != request.chat_id:
+                continue
+            if not queued.plain_text():
+                break
+            text = request.args[1] + "\n\n" + queued.args[1]
+            if len(text) > MESSAGE_LIMIT:
+                break
+            shard.requests.remove(queued)
+            request.args = (request.chat_id, text)
+            request.futures += queued.futures
+            with self._stats_lock:
+                self._coalesced += 1
+
+    def _take_global(self, request):
+        if not request.limited:
+            return
+        while True:
+            with self._bucket_lock:
+                wait = self.bucket.try_take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def _work(self, shard):
+        while True:
+            request = self._next_request(shard)
+            self._take_global(request)
+            waited = time.monotonic() - request.queued_at
+            self.wait.observe(waited)
+            try:
+                result = self._call(request)
+            except ApiTelegramException as e:
+                if e.error_code == 429 and request.attempts < self.max_retries:
+                    retry_after = e.result_json.get("parameters", {}).get("retry_after", 1)
+                    print(f"Telegram 429 для чата {request.chat_id}: повтор через {retry_after} с")
+                    request.attempts += 1
+                    with shard.cond:
+                        shard.blocked_until[request.chat_id] = time.monotonic() + retry_after
+                        shard.requests.appendleft(request)
+                    with self._stats_lock:
+                        self._retried += 1
+                    continue
+                self._fail(request, e)
+            except Exception as e:
+                self._fail(request, e)
+            else:
+                for future in request.futures:
+                    future.set_result(result)
+            with self._stats_lock:
+                self._sent += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+    def _call(self, request):
+        started = time.monotonic()
+        try:
+            return getattr(self.bot, request.method)(*request.args, **request.kwargs)
+        finally:
+            self.latency.observe(request.method, time.monotonic() - started)
+
+    def _fail(self, request, error):
+        print(f"Ошибка запроса {request.method} в чат {request.chat_id}: {error}")
+        for future in request.futures:
+            future.set_exception(error)
@@ -0,0 +1,238 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from telebot import Handler
+from telebot.handler_backends import HandlerBackend
+
+
+class _Entry:
+    __slots__ = ("data", "steps", "touched_at")
+
+    def __init__(self, data, steps, touched_at):
+        self.data = data
+        self.steps = steps
+        self.touched_at = touched_at
+
+
+class MemorySessionStore:
+    """Сессии чатов в памяти: LRU с вытеснением после ttl секунд простоя.
+
+    Ведёт себя как словарь chat_id -> данные отчёта, поэтому обработчики
+    работают с ним так же, как раньше с user_data. Кроме данных хранит
+    ожидаемый шаг диалога (next-step обработчик).
+    """
+
+    def __init__(self, ttl=12 * 3600, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    # --- словарный интерфейс для обработчиков ---
+
+    def __getitem__(self, chat_id):
+        with self._lock:
+            entry = self._entry(chat_id)
+            if entry is None or entry.data is None:
+                raise KeyError(chat_id)
+            return entry.data
+
+    def __setitem__(self, chat_id, data):
+        with self._lock:
+            entry = self._entry(chat_id, create=True)
+            entry.data = data
+            self._store(chat_id, entry)
+
+    def __contains__(self, chat_id):
+        with self._lock:
+            entry = self._entry(chat_id)
+            return entry is not None and entry.data is not None
+
+    def __len__(self):
+        """Число активных сессий в памяти"""
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.data is not None)
+
+    def get(self, chat_id, default=None):
+        try:
+            return self[chat_id]
+        except KeyError:
+            return default
+
+    def pop(self, chat_id, default=None):
+        with self._lock:
+            entry = self._entry(chat_id)
+            if entry is None or entry.data is None:
+                return default
+            data, entry.data = entry.data, None
+            self._store(chat_id, entry)
+            return data
+
+    def save(self, chat_id):
+        """Фиксирует изменения, сделанные обработчиком в данных сессии"""
+        with self._lock:
+            entry = self._entry(chat_id)
+            if entry is not None:
+                self._store(chat_id, entry)
+
+    # --- ожидаемые шаги диалога ---
+
+    def add_step(self, chat_id, step):
+        with self._lock:
+            entry = self._entry(chat_id, create=True)
+            entry.steps.append(step)
+            self._store(chat_id, entry)
+
+    def pop_steps(self, chat_id):
+        with self._lock:
+            entry = self._entry(chat_id)
+            if entry is None or not entry.steps:
+                return []
+            steps, entry.steps = entry.steps, []
+            self._store(chat_id, entry)
+            return steps
+
+    def clear_steps(self, chat_id):
+        self.pop_steps(chat_id)
+
+    # --- вытеснение ---
+
+    def evict_expired(self):
+        """Удаляет сессии, простаивающие дольше ttl"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [chat_id for chat_id, entry in self._entries.items() if entry.touched_at < deadline]
+            for chat_id in expired:
+                del self._entries[chat_id]
+
+    def start_eviction(self, interval=300):
+        def run():
+            while True:
+                time.sleep(interval)
+                self.evict_expired()
+
+        threading.Thread(target=run, name="session-eviction", daemon=True).start()
+
+    def _entry(self, chat_id, create=False):
+        entry = self._entries.get(chat_id)
+        if entry is not None and entry.touched_at < time.time() - self.ttl:
+            self._entries.pop(chat_id)
+            entry = None
+        if entry is None:
+            entry = self._load(chat_id)
+            if entry is None and create:
+                entry = _Entry(None, [], time.time())
+            if entry is not None:
+                self._cache(chat_id, entry)
+        return entry
+
+    def _cache(self, chat_id, entry):
+        self._entries[chat_id] = entry
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _store(self, chat_id, entry):
+        entry.touched_at = time.time()
+        self._cache(chat_id, entry)
+
+    def _load(self, chat_id):
+        return None
+
+
+class SqliteSessionStore(MemorySessionStore):
+    """Сессии в SQLite: переживают перезапуск, горячие сессии кешируются в памяти.
+
+    encode/decode переводят данные сессии в JSON-совместимый вид и обратно.
+    """
+
+    def __init__(self, path, ttl=12 * 3600, max_size=1000, encode=None, decode=None):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self.encode = encode or (lambda data: data)
+        self.decode = decode or (lambda data: data)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " chat_id INTEGER PRIMARY KEY,"
+            " data TEXT,"
+            " steps TEXT NOT NULL,"
+            " touched_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched_at)")
+
+    def drop_cache(self, chats=None):
+        """Забывает сессии в памяти: следующее обращение перечитает их из базы.
+
+        Нужно, когда чаты переходят от другого процесса с той же базой сессий.
+        chats(chat_id) выбирает забываемые чаты; без него забываются все.
+        """
+        with self._lock:
+            for chat_id in [chat_id for chat_id in self._entries if chats is None or chats(chat_id)]:
+                del self._entries[chat_id]
+
+    def evict_expired(self):
+        super().evict_expired()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE touched_at < ?", (time.time() - self.ttl,))
+
+    def _store(self, chat_id, entry):
+        super()._store(chat_id, entry)
+        data = self.encode(entry.data) if entry.data is not None else None
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (chat_id, data, steps, touched_at) VALUES (?, ?, ?, ?)",
+                (chat_id, json.dumps(data, ensure_ascii=False),
+                 json.dumps(entry.steps, ensure_ascii=False), entry.touched_at),
+            )
+
+    def _load(self, chat_id):
+        row = self._conn.execute(
+            "SELECT data, steps, touched_at FROM sessions WHERE chat_id = ? AND touched_at >= ?",
+            (chat_id, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        data, steps, touched_at = row
+        data = json.loads(data)
+        return _Entry(self.decode(data) if data is not None else None, json.loads(steps), touched_at)
+
+
+class SessionStepBackend(HandlerBackend):
+    """Next-step обработчики TeleBot, сохранённые в сессии по имени функции.
+
+    resolve(name) возвращает функцию-обработчик по имени; аргументы обработчика
+    должны сериализоваться в JSON, поэтому лямбды не поддерживаются.
+    """
+
+    def __init__(self, store, resolve):
+        super().__init__()
+        self.store = store
+        self.resolve = resolve
+
+    def register_handler(self, handler_group_id, handler):
+        self.store.add_step(handler_group_id, {
+            "callback": handler.callback.__name__,
+            "args": list(handler.args),
+            "kwargs": handler.kwargs,
+        })
+
+    def clear_handlers(self, handler_group_id):
+        self.store.clear_steps(handler_group_id)
+
+    def get_handlers(self, handler_group_id):
+        handlers = []
+        for step in self.store.pop_steps(handler_group_id):
+            callback = self.resolve(step["callback"])
+            if callback is None:
+                print(f"Неизвестный шаг диалога: {step['callback']}")
+                continue
+            handlers.append(Handler(callback, *step["args"], **step["kwargs"]))
+        return handlers or None
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+
+from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+
+from sheets_scheduler import PRIORITY_WRITE
+
+
+class SheetsConnection:
+    """Подключение к таблице в фоновом потоке: бот принимает обновления, не дожидаясь Google.
+
+    connect() возвращает авторизованный клиент gspread. Ключ таблицы и id листа
+    сохраняются в cache_path, и следующие запуски открывают таблицу по ключу
+    без поиска по имени в Drive. Пока Google недоступен, подключение повторяется
+    с экспоненциальной задержкой.
+    """
+
+    CONNECTING = "connecting"
+    READY = "ready"
+
+    def __init__(self, connect, spreadsheet_name, scheduler, cache_path, retry_base=2, retry_max=300):
+        self.connect = connect
+        self.spreadsheet_name = spreadsheet_name
+        self.scheduler = scheduler
+        self.cache_path = cache_path
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.state = self.CONNECTING
+        self.last_error = None
+        self.worksheet = None
+        self.ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sheets-connection", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Ждёт подключения; возвращает лист или None, если не успели"""
+        self.ready.wait(timeout)
+        return self.worksheet
+
+    def _run(self):
+        attempts = 0
+        while True:
+            started = time.monotonic()
+            try:
+                worksheet = self._open(self.connect())
+            except Exception as e:
+                self.last_error = e
+                delay = min(self.retry_max, self.retry_base * 2 ** attempts)
+                attempts += 1
+                print(f"Нет подключения к Google Sheets: {e}. Повтор через {delay} с")
+                time.sleep(delay)
+                continue
+            self.worksheet = worksheet
+            self.last_error = None
+            self.state = self.READY
+            self.ready.set()
+            print(f"Google Sheets подключена за {time.monotonic() - started:.1f} с")
+            return
+
+    def _open(self, client):
+        cached = self._load_cache()
+        if cached is not None:
+            try:
+                spreadsheet = self.scheduler.call(client.open_by_key, cached["key"])
+                return self.scheduler.call(spreadsheet.get_worksheet_by_id, cached["worksheet_id"])
+            except (SpreadsheetNotFound, WorksheetNotFound):
+                print("Сохранённая таблица не найдена, ищем по имени")
+        # Поиск по имени - запрос к Drive, поэтому выполняется один раз
+        spreadsheet = self.scheduler.call(client.open, self.spreadsheet_name)
+        worksheet = self.scheduler.call(lambda: spreadsheet.sheet1)  # Первый лист в таблице
+        try:
+            self._save_cache({"key": spreadsheet.id, "worksheet_id": worksheet.id})
+        except OSError as e:
+            print(f"Не удалось сохранить {self.cache_path}: {e}")
+        return worksheet
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError) as e:
+            print(f"Не удалось прочитать {self.cache_path}: {e}")
+            return None
+
+    def _save_cache(self, data):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+class WorksheetPool:
+    """Открытые листы таблицы по названию: каждый лист открывается один раз за время работы бота.
+
+    Первое обращение читает список всех листов одним запросом; лист, которого
+    ещё нет, создаётся. None - основной лист из SheetsConnection. Список мог
+    устареть (лист переименовали, удалили или создал другой процесс) - после
+    ошибки записи в лист его забывают через invalidate().
+    """
+
+    def __init__(self, connection, scheduler, rows=1000, cols=26):
+        self.connection = connection
+        self.scheduler = scheduler
+        self.rows = rows
+        self.cols = cols
+        self._worksheets = None
+        self._lock = threading.Lock()
+
+    def get(self, title=None):
+        if title is None:
+            return self.connection.wait()
+        worksheets = self._worksheets
+        if worksheets is not None and title in worksheets:
+            return worksheets[title]
+        with self._lock:
+            spreadsheet = self.connection.wait().spreadsheet
+            if self._worksheets is None:
+                self._worksheets = {worksheet.title: worksheet
+                                    for worksheet in self.scheduler.call(spreadsheet.worksheets)}
+            worksheet = self._worksheets.get(title)
+            if worksheet is None:
+                try:
+                    worksheet = self.scheduler.call(spreadsheet.add_worksheet, title, rows=self.rows,
+                                                    cols=self.cols, priority=PRIORITY_WRITE)
+                except APIError:
+                    self._worksheets = None  # Например, лист уже создан: перечитаем список
+                    raise
+                self._worksheets[title] = worksheet
+            return worksheet
+
+    def invalidate(self, title=None):
+        """Забывает открытые листы: следующий get(title) перечитает список листов таблицы"""
+        if title is None:
+            return  # Основной лист переоткрывает SheetsConnection
+        with self._lock:
+            self._worksheets = None
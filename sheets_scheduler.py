@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from google.auth.exceptions import TransportError
+
+# Чем меньше число, тем раньше выполняется запрос: записи отчётов важнее чтений
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+
+
+class CircuitOpenError(Exception):
+    """Google Sheets недоступен, вызовы временно не выполняются"""
+
+
+class TokenBucket:
+    """Ведро токенов: rate запросов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self):
+        """Забирает токен; возвращает 0 или сколько секунд ждать до следующего токена"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        """Обнуляет запас, например после ответа 429"""
+        self._refill()
+        self.tokens = 0
+
+
+class CircuitBreaker:
+    """Отключает вызовы после серии ошибок и пробует снова после паузы"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, cooldown=60):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    def allow(self):
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # В полуоткрытом состоянии пропускаем только один пробный запрос
+            return not self._trial_running
+        return self.state == self.CLOSED
+
+    def begin(self):
+        if self.state == self.HALF_OPEN:
+            self._trial_running = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _is_failure(error):
+    """Считается ли ошибка сбоем Google для автомата отключения: 429, 5xx и ошибки соединения.
+
+    Прочие ответы - о самом запросе (диапазон за краем листа, нет листа при
+    поиске листа станции, неверные данные) - значат, что Google работает,
+    и автомат не размыкают.
+    """
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Ошибки requests (соединение, таймаут) - подклассы OSError
+    return isinstance(error, (OSError, TransportError))
+
+
+class SheetsScheduler:
+    """Единая очередь вызовов gspread с учётом квоты Google и автоматом отключения.
+
+    Подряд без ожидания уходит не больше burst_seconds секунд квоты: полная
+    минутная квота одной пачкой упирается в поминутный лимит Google и даёт 429.
+    """
+
+    def __init__(self, requests_per_minute=60, failure_threshold=5, cooldown=60, burst_seconds=5):
+        rate = requests_per_minute / 60.0
+        self.bucket = TokenBucket(rate, max(1.0, rate * burst_seconds))
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self._queue = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="sheets-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, func, *args, priority=PRIORITY_READ, **kwargs):
+        """Ставит вызов в очередь и возвращает Future с его результатом"""
+        future = Future()
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._order), future, func, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def call(self, func, *args, priority=PRIORITY_READ, **kwargs):
+        """Выполняет вызов через очередь и ждёт результат"""
+        return self.submit(func, *args, priority=priority, **kwargs).result()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "state": self.breaker.state,
+                "failures": self.breaker.failures,
+                "tokens": round(self.bucket.tokens, 2),
+            }
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                if not self.breaker.allow():
+                    # Пока автомат разомкнут, не держим вызывающих в ожидании
+                    _, _, future, _, _, _ = heapq.heappop(self._queue)
+                    future.set_exception(CircuitOpenError("Google Sheets временно недоступен"))
+                    continue
+                wait = self.bucket.try_take()
+                if wait:
+                    # Пока ждём токен, в очередь может прийти более срочный запрос
+                    self._cond.wait(wait)
+                    continue
+                self.breaker.begin()
+                return heapq.heappop(self._queue)
+
+    def _run(self):
+        while True:
+            _, _, future, func, args, kwargs = self._next_task()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                with self._cond:
+                    if _is_failure(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    if _status_code(e) == 429:
+                        self.bucket.drain()
+                future.set_exception(e)
+            else:
+                with self._cond:
+                    self.breaker.record_success()
+                future.set_result(result)
@@ -0,0 +1,76 @@
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+from metrics import Histograms
+
+
+def operation_name(method, url):
+    """Имя вызова для гистограмм: метод, хост и действие (":append", ":batchUpdate")"""
+    parts = urlsplit(url)
+    last = parts.path.rsplit("/", 1)[-1]
+    action = ":" + last.rsplit(":", 1)[1] if ":" in last else ""
+    return f"{method} {parts.netloc}{action}"
+
+
+class SheetsSession(AuthorizedSession):
+    """HTTP-сессия Google API с пулом keep-alive соединений и заблаговременным обновлением токена.
+
+    Токен обновляется в фоне за refresh_margin секунд до истечения, поэтому
+    запись отчёта не ждёт лишнего запроса к OAuth. Длительность каждого
+    вызова попадает в гистограмму latency.
+    """
+
+    def __init__(self, credentials, pool_size=10, refresh_margin=300):
+        super().__init__(credentials)
+        self.refresh_margin = refresh_margin
+        self.latency = Histograms()
+        self._refresh_lock = threading.Lock()
+        # Одно TLS-соединение к каждому хосту Google переиспользуется между сохранениями
+        self.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+
+    def start_refresh(self):
+        threading.Thread(target=self._refresh_loop, name="sheets-token", daemon=True).start()
+
+    def request(self, method, url, *args, **kwargs):
+        if not self.credentials.valid:
+            # Фоновое обновление не успело (старт или сбой): обновляем один раз, а не в каждом потоке
+            self.refresh_token()
+        started = time.monotonic()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            self.latency.observe(operation_name(method, url), time.monotonic() - started)
+
+    def refresh_token(self, force=False):
+        with self._refresh_lock:
+            if force or not self.credentials.valid:
+                started = time.monotonic()
+                self.credentials.refresh(self._auth_request)
+                self.latency.observe("token refresh", time.monotonic() - started)
+
+    def _seconds_to_refresh(self):
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return 0.0
+        # expiry в google-auth - наивное время UTC
+        return (expiry - datetime.utcnow()).total_seconds() - self.refresh_margin
+
+    def _refresh_loop(self):
+        while True:
+            wait = self._seconds_to_refresh()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            try:
+                self.refresh_token(force=True)
+            except Exception as e:
+                print(f"Не удалось обновить токен Google: {e}. Повтор через 30 с")
+            else:
+                if self._seconds_to_refresh() > 0:
+                    continue
+            time.sleep(30)  # Не крутимся, если токен выдан короче refresh_margin
@@ -0,0 +1,122 @@
+import atexit
+import threading
+import time
+
+from gspread.exceptions import APIError
+
+from row_cursor import RowCursor
+
+
+class SheetsWriter:
+    """Фоновая доставка строк отчётов из локального журнала в Google Sheets пачками.
+
+    До подключения к таблице строки копятся в журнале. Пачка делится по листам
+    станций: у каждого листа свой хвост (RowCursor) из пула worksheets, и сбой
+    записи в один лист откладывает только его строки.
+    on_delivered(worksheet, first_row, rows) вызывается после каждой записанной
+    части пачки; worksheet - название листа, None - основной лист; first_row
+    None - номер строки не удалось узнать из ответа Google.
+    poll_interval - как часто перечитывать журнал без сигнала put(): нужно, когда
+    в общий журнал пишут другие процессы (реплики кластера); None - только по сигналу.
+    """
+
+    def __init__(self, outbox, worksheets, scheduler, batch_size=20, flush_interval=5.0, retry_base=2, retry_max=300,
+                 on_delivered=None, poll_interval=None):
+        self.outbox = outbox
+        self.on_delivered = on_delivered
+        self.worksheets = worksheets
+        self.connection = worksheets.connection
+        self.scheduler = scheduler
+        self.cursors = {}  # Название листа -> RowCursor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=30):
+        """Пробует доставить накопленные строки и останавливает поток"""
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def put(self, row, key=None, station=None, date=None, worksheet=None):
+        """Фиксирует строку в журнале на диске и будит поток доставки; None - дубль по ключу"""
+        entry_id = self.outbox.add(row, key=key, station=station, date=date, worksheet=worksheet)
+        if entry_id is not None:
+            self._wakeup.set()
+        return entry_id
+
+    def _run(self):
+        while True:
+            stopping = self._stopping.is_set()
+            if not self.connection.ready.is_set():
+                if stopping:
+                    return
+                self.connection.wait(1.0)  # Заодно проверяем, не пора ли остановиться
+                continue
+            batch = self.outbox.pending(self.batch_size)
+            now = time.time()
+            if batch and (len(batch) >= self.batch_size or stopping
+                          or now - batch[0][2] >= self.flush_interval):
+                delivered = self._flush(batch)
+                if delivered and len(batch) == self.batch_size:
+                    continue  # В журнале могут быть ещё строки
+                if not stopping:
+                    continue  # Неудачная пачка отложена, пересчитываем ожидание
+            if stopping:
+                return
+            self._wakeup.wait(self._idle_timeout(batch, now))
+            self._wakeup.clear()
+
+    def _idle_timeout(self, batch, now):
+        """Сколько ждать до следующей пачки: по времени сброса или по ближайшей повторной попытке"""
+        if batch:
+            timeout = max(0.0, batch[0][2] + self.flush_interval - now)
+        else:
+            next_attempt = self.outbox.next_attempt_at()
+            timeout = None if next_attempt is None else max(0.0, next_attempt - now)
+        if self.poll_interval is not None:
+            # Строки других процессов не будят поток: журнал перечитывается не реже poll_interval
+            timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+        return timeout
+
+    def _flush(self, batch):
+        groups = {}  # Лист -> (номера записей, строки) в порядке журнала
+        for entry_id, row, _, worksheet in batch:
+            ids, rows = groups.setdefault(worksheet, ([], []))
+            ids.append(entry_id)
+            rows.append(row)
+        delivered = True
+        for worksheet, (ids, rows) in groups.items():
+            delivered = self._flush_worksheet(worksheet, ids, rows) and delivered
+        return delivered
+
+    def _flush_worksheet(self, worksheet, ids, rows):
+        try:
+            cursor = self.cursors.get(worksheet)
+            if cursor is None:
+                cursor = self.cursors[worksheet] = RowCursor(self.worksheets.get(worksheet), self.scheduler)
+            first_row = cursor.append(rows)
+        except Exception as e:
+            if isinstance(e, APIError):
+                # Лист могли переименовать или удалить: при повторе он откроется заново
+                self.cursors.pop(worksheet, None)
+                self.worksheets.invalidate(worksheet)
+            delay = self.outbox.mark_failed(ids, self.retry_base, self.retry_max)
+            print(f"APIError: {e}. Строк в журнале: {len(ids)}, повтор через {delay} с")
+            return False
+        self.outbox.mark_delivered(ids, first_row)
+        if self.on_delivered is not None:
+            try:
+                self.on_delivered(worksheet, first_row, rows)
+            except Exception as e:
+                print(f"Ошибка обработки записанной пачки: {e}")
+        return True
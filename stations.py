@@ -0,0 +1,68 @@
+import json
+
+DEFAULT_OPERATORS = ("Оператор 1", "Оператор 2", "Оператор 3")
+DEFAULT_CONTRACTORS = ("Контрагент 1", "Контрагент 2", "Контрагент 3")
+
+
+class Station:
+    """АЗС: лист, в который пишутся её отчёты, и списки операторов и контрагентов для кнопок"""
+
+    __slots__ = ("id", "name", "worksheet", "operators", "contractors")
+
+    def __init__(self, id, name=None, worksheet=None, operators=DEFAULT_OPERATORS, contractors=DEFAULT_CONTRACTORS):
+        self.id = str(id)
+        self.name = name or self.id
+        self.worksheet = worksheet  # None - основной лист таблицы
+        self.operators = tuple(operators)
+        self.contractors = tuple(contractors)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["id"], data.get("name"), data.get("worksheet"),
+                   data.get("operators", DEFAULT_OPERATORS), data.get("contractors", DEFAULT_CONTRACTORS))
+
+
+class StationRegistry:
+    """Станции по чатам, загружаются один раз при старте из stations.json.
+
+    Формат файла:
+        {"stations": [{"id": "azs-1", "name": "АЗС №1", "worksheet": "АЗС №1", "chats": [123456],
+                       "operators": ["Иванов"], "contractors": ["ООО Ромашка"]}]}
+
+    Чат, которого нет в реестре, считается отдельной станцией с основным листом
+    и списками по умолчанию - так бот работал до появления реестра.
+    """
+
+    def __init__(self, stations=(), chats=None):
+        self.stations = {station.id: station for station in stations}
+        self._chats = dict(chats or {})  # chat_id -> Station
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        stations, chats = [], {}
+        for item in data.get("stations", []):
+            station = Station.from_dict(item)
+            stations.append(station)
+            for chat_id in item.get("chats", []):
+                if chat_id in chats:
+                    raise ValueError(f"{path}: чат {chat_id} указан у станций {chats[chat_id].id} и {station.id}")
+                chats[chat_id] = station
+        return cls(stations, chats)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def for_chat(self, chat_id):
+        station = self._chats.get(chat_id)
+        if station is None:
+            station = self._chats.setdefault(chat_id, Station(chat_id))
+        return station
+
+    def worksheets(self):
+        """Названия листов всех станций из реестра"""
+        return sorted({station.worksheet for station in self.stations.values() if station.worksheet})
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cluster import ClusterMember, UpdateSpool  # noqa: E402
+from session_store import SqliteSessionStore  # noqa: E402
+
+
+class IdleDispatcher:
+    """Диспетчер без обновлений: считает ожидания join()"""
+
+    def __init__(self):
+        self.on_done = None
+        self.joins = 0
+
+    def join(self):
+        self.joins += 1
+
+
+def test_partition_takeover_keeps_sessions_of_owned_chats(tmp_path):
+    sessions_path = str(tmp_path / "sessions.db")
+    sessions = SqliteSessionStore(sessions_path)
+    other_replica = SqliteSessionStore(sessions_path)
+    dispatcher = IdleDispatcher()
+    member = ClusterMember(UpdateSpool(str(tmp_path / "updates.db"), 2), dispatcher,
+                           str(tmp_path / "cluster"), replica=0, replicas=2, sessions=sessions)
+    member.rebalance()  # Свой раздел 0 и раздел 1 без реплики
+
+    # Чат 2 (раздел 0) посреди диалога, чат 3 (раздел 1) вела другая реплика
+    sessions[2] = {"step": "fuel_ai92"}
+    sessions[3] = {"step": "start"}
+    other_replica[3] = {"step": "fuel_dt"}
+    data = sessions[2]
+    data["fuel_ai92"] = 1600
+
+    member.locks[1].release()  # Раздел 1 снова без хозяина - реплика берёт его заново
+    member.rebalance()
+    sessions.save(2)  # Обработчик чата 2 сохраняет изменения после захвата раздела
+
+    assert dispatcher.joins >= 1
+    assert SqliteSessionStore(sessions_path)[2] == {"step": "fuel_ai92", "fuel_ai92": 1600}
+    assert sessions[3] == {"step": "fuel_dt"}  # Сессия полученного раздела перечитана из базы
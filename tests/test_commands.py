@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from e2e import report_flow, start_bot  # noqa: E402
+from fake_sheets import FakeSpreadsheet  # noqa: E402
+from fake_telegram import FakeBotApi  # noqa: E402
+
+CHAT_ID = 200001
+AI92_COUNTER_STEPS = 8  # Шаги отчёта до вопроса о показаниях счётчика АИ-92-К5
+
+
+@pytest.fixture(scope="module")
+def bot():
+    """Бот целиком (main.py) против заглушки Bot API и таблицы в памяти"""
+    cwd = os.getcwd()
+    api = FakeBotApi()
+    api.start()
+    main = start_bot(api, FakeSpreadsheet(), argparse.Namespace(chat_rate=1000))
+    main.sheets_connection.wait(30)
+    yield api, main
+    os.chdir(cwd)
+    api.shutdown()
+
+
+def walk(api, chat_id, steps):
+    """Проходит шаги диалога, дожидаясь ответа бота на каждый"""
+    previous = api.call_count(chat_id)
+    for kind, text in steps:
+        seen = api.call_count(chat_id)
+        if kind == "say":
+            api.push_message(chat_id, text)
+        else:
+            message_id, data = api.wait_button(chat_id, text, since=previous, timeout=10)
+            api.push_callback(chat_id, message_id, data)
+        api.wait_calls(chat_id, seen + 1, timeout=10)
+        previous = seen
+
+
+def test_debts_mid_dialog_keeps_report_step(bot):
+    api, main = bot
+    walk(api, CHAT_ID, report_flow(1)[:AI92_COUNTER_STEPS])
+
+    seen = api.call_count(CHAT_ID)
+    api.push_message(CHAT_ID, "/debts")
+    api.wait_text(CHAT_ID, "Долгов нет.", since=seen, timeout=10)
+
+    seen = api.call_count(CHAT_ID)
+    api.push_message(CHAT_ID, "1600")
+    api.wait_text(CHAT_ID, "Продано АИ-92-К5 (в литрах) за наличные:", since=seen, timeout=10)
+    assert main.user_data[CHAT_ID].fuel_ai92.counter == 1600
+
+
+def test_month_mid_dialog_keeps_report_step(bot):
+    api, main = bot
+    chat_id = CHAT_ID + 1
+    walk(api, chat_id, report_flow(2)[:AI92_COUNTER_STEPS])
+
+    seen = api.call_count(chat_id)
+    api.push_message(chat_id, "/month 09.2026")
+    api.wait_text(chat_id, "За 09.2026 отчётов нет.", since=seen, timeout=10)
+
+    seen = api.call_count(chat_id)
+    api.push_message(chat_id, "1700")
+    api.wait_text(chat_id, "Продано АИ-92-К5 (в литрах) за наличные:", since=seen, timeout=10)
+    assert main.user_data[chat_id].fuel_ai92.counter == 1700
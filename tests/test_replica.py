@@ -0,0 +1,66 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fake_sheets import FakeSpreadsheet  # noqa: E402
+from replica import ReplicaSync, ReportReplica  # noqa: E402
+from report import Debt, FuelBlock, Report  # noqa: E402
+from sheets_connection import WorksheetPool  # noqa: E402
+from sheets_scheduler import SheetsScheduler  # noqa: E402
+
+STATION = "АЗС №1"
+HEADER = ["Дата", "Оператор", "Температура", "Комментарии"]
+
+
+class Connection:
+    def __init__(self, spreadsheet):
+        self.main = spreadsheet.sheet1
+
+    def wait(self, timeout=None):
+        return self.main
+
+
+def report_row(date, operator, contractor=None):
+    debtors = [Debt(contractor, 30)] if contractor else []
+    return Report(date=date, operator=operator, temperature=15.5, comments="",
+                  fuel_ai92=FuelBlock(None, 100, 50, 150), fuel_dt=FuelBlock(None, 200, 100, 300, debtors)).to_row()
+
+
+def test_sync_mirrors_station_sheets_and_skips_header(tmp_path):
+    spreadsheet = FakeSpreadsheet()
+    scheduler = SheetsScheduler(requests_per_minute=600)
+    scheduler.start()
+    pool = WorksheetPool(Connection(spreadsheet), scheduler)
+    spreadsheet.sheet1.rows = [HEADER, report_row("17.10.2026", "Оператор 1")]
+    spreadsheet.add_worksheet(STATION).rows = [report_row("18.10.2026", "Иванов", "ООО Ромашка")]
+
+    replica = ReportReplica(str(tmp_path / "replica.sqlite3"))
+    assert ReplicaSync(replica, pool, scheduler, titles=[STATION]).sync() == 3
+
+    assert replica.reports_on("17.10.2026") == [report_row("17.10.2026", "Оператор 1")]
+    assert not replica.has_report("Дата")
+    # Строка 1 листа станции не затирает строку 1 основного листа
+    assert replica.reports_by_operator("Иванов") == [report_row("18.10.2026", "Иванов", "ООО Ромашка")]
+    assert replica.debts_of("ООО Ромашка") == [("18.10.2026", "dt", 30)]
+    assert (replica.synced_row(), replica.synced_row(STATION)) == (2, 1)
+
+
+def test_sync_reads_past_stale_row_count(tmp_path):
+    spreadsheet = FakeSpreadsheet()
+    scheduler = SheetsScheduler(requests_per_minute=600)
+    scheduler.start()
+    worksheet = spreadsheet.sheet1
+    worksheet.row_count = 0
+    worksheet.append_rows([report_row(f"{day:02}.10.2026", "Оператор 1") for day in range(1, 16)],
+                          insert_data_option="INSERT_ROWS")
+    worksheet.row_count = 12  # Метаданные листа прочитаны до последней вставки строк
+
+    replica = ReportReplica(str(tmp_path / "replica.sqlite3"))
+    sync = ReplicaSync(replica, WorksheetPool(Connection(spreadsheet), scheduler), scheduler, chunk=10)
+    assert sync.sync() == 15  # "A1:V10", затем открытый снизу "A11:V"
+    worksheet.row_count = 15
+    assert sync.sync() == 0  # "A16:V25" за краем сетки - новых строк нет
+    assert replica.synced_row() == 15
@@ -0,0 +1,66 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from row_cursor import RowCursor  # noqa: E402
+from sheets_scheduler import SheetsScheduler  # noqa: E402
+
+EXISTING_ROWS = 5000
+
+
+class LargeWorksheet:
+    """Лист на 5000 строк: чтение колонки или всего листа - ошибка, запись только через append_rows"""
+
+    def __init__(self, rows=EXISTING_ROWS):
+        self.rows = rows
+        self.calls = []
+
+    def col_values(self, *args, **kwargs):
+        raise AssertionError("сохранение не должно читать колонку")
+
+    def get_all_values(self, *args, **kwargs):
+        raise AssertionError("сохранение не должно читать весь лист")
+
+    def append_rows(self, values, **kwargs):
+        self.calls.append(("append_rows", kwargs))
+        first = self.rows + 1
+        self.rows += len(values)
+        return {"updates": {"updatedRange": f"'Лист1'!A{first}:V{self.rows}"}}
+
+    def __getattr__(self, name):
+        raise AssertionError(f"лишний вызов {name}")
+
+
+def make_cursor(worksheet):
+    scheduler = SheetsScheduler(requests_per_minute=600)
+    scheduler.start()
+    return RowCursor(worksheet, scheduler)
+
+
+def test_each_save_is_one_append_on_large_sheet():
+    worksheet = LargeWorksheet()
+    cursor = make_cursor(worksheet)
+    for save in range(3):
+        calls_before = len(worksheet.calls)
+        first = cursor.append([["18.10.2026", "Оператор 1", 15.5]])
+        assert first == EXISTING_ROWS + 1 + save
+        assert worksheet.calls[calls_before:] == [
+            ("append_rows", {"insert_data_option": "INSERT_ROWS", "table_range": "A1"}),
+        ]
+    assert cursor.conflicts == 0
+
+
+class UnparsedRangeWorksheet(LargeWorksheet):
+    def append_rows(self, values, **kwargs):
+        super().append_rows(values, **kwargs)
+        return {"updates": {"updatedRange": "'Лист1'!A:V"}}
+
+
+def test_append_with_unparsed_range_counts_as_written():
+    worksheet = UnparsedRangeWorksheet()
+    cursor = make_cursor(worksheet)
+    assert cursor.append([["18.10.2026"]]) is None
+    assert len(worksheet.calls) == 1  # Без исключения - журнал не повторит запись
+    assert cursor.append([["19.10.2026"]]) is None
+    assert cursor.conflicts == 0
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import Report  # noqa: E402
+from session_store import MemorySessionStore  # noqa: E402
+from wizard import Wizard  # noqa: E402
+
+CHAT_ID = 5
+
+
+class Message:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class StalledSender:
+    """Очередь отправки, ответы которой приходят, только когда тест их завершит"""
+
+    def __init__(self):
+        self.futures = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+
+def make_wizard():
+    store = MemorySessionStore()
+    store[CHAT_ID] = Report()
+    sender = StalledSender()
+    return store, sender, Wizard(None, sender, store, timeout=0.05)
+
+
+def test_show_does_not_wait_for_stalled_send():
+    store, sender, wizard = make_wizard()
+
+    started = time.monotonic()
+    assert wizard.show(CHAT_ID, "Выберите оператора") is None
+    assert time.monotonic() - started < 1
+    assert store[CHAT_ID].wizard_message_id is None
+
+    sender.futures[-1].set_result(Message(42))  # Ответ пришёл после таймаута
+    assert store[CHAT_ID].wizard_message_id == 42
+
+
+def test_late_reply_of_previous_step_is_ignored():
+    store, sender, wizard = make_wizard()
+    wizard.show(CHAT_ID, "Выберите оператора")
+    wizard.show(CHAT_ID, "Температура воздуха")
+    first, second = sender.futures
+
+    second.set_result(Message(43))
+    first.set_result(Message(42))
+    assert store[CHAT_ID].wizard_message_id == 43
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import pytest
+from gspread.exceptions import APIError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox  # noqa: E402
+from sheets_connection import WorksheetPool  # noqa: E402
+from sheets_scheduler import SheetsScheduler  # noqa: E402
+from sheets_writer import SheetsWriter  # noqa: E402
+
+STATION = "АЗС 1"
+
+
+class ErrorResponse:
+    status_code = 400
+
+    def __init__(self, message):
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text, "status": "INVALID_ARGUMENT"}}
+
+
+class Sheet:
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+        self.deleted = False
+
+    def append_rows(self, values, **kwargs):
+        if self.deleted:
+            raise APIError(ErrorResponse(f"Unable to parse range: '{self.title}'!A1"))
+        first = len(self.rows) + 1
+        self.rows.extend(values)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:V{len(self.rows)}"}}
+
+
+class Spreadsheet:
+    """Таблица, листы которой меняют и другие процессы"""
+
+    def __init__(self):
+        self.sheets = {}
+        self.listed = 0
+
+    def worksheets(self):
+        self.listed += 1
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26):
+        if title in self.sheets:
+            raise APIError(ErrorResponse(f'A sheet with the name "{title}" already exists.'))
+        sheet = self.sheets[title] = Sheet(title)
+        return sheet
+
+    def recreate(self, title):
+        """Лист удалили и создали заново, например вручную"""
+        self.sheets[title].deleted = True
+        self.sheets[title] = Sheet(title)
+
+
+class Connection:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def wait(self, timeout=None):
+        return self
+
+
+def make_pool():
+    spreadsheet = Spreadsheet()
+    scheduler = SheetsScheduler(requests_per_minute=600)
+    scheduler.start()
+    return spreadsheet, WorksheetPool(Connection(spreadsheet), scheduler)
+
+
+def test_existing_sheet_found_after_add_conflict():
+    spreadsheet, pool = make_pool()
+    pool.get("Сводка")  # Список листов прочитан без листа станции
+    spreadsheet.sheets[STATION] = Sheet(STATION)  # Лист создал другой процесс
+    with pytest.raises(APIError):
+        pool.get(STATION)
+    assert pool.get(STATION) is spreadsheet.sheets[STATION]
+
+
+def test_writer_reopens_recreated_sheet(tmp_path):
+    spreadsheet, pool = make_pool()
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    writer = SheetsWriter(outbox, pool, pool.scheduler, retry_base=0)
+    first = outbox.add(["18.10.2026"], worksheet=STATION)
+    assert writer._flush_worksheet(STATION, [first], [["18.10.2026"]])
+    spreadsheet.recreate(STATION)
+
+    second = outbox.add(["19.10.2026"], worksheet=STATION)
+    assert not writer._flush_worksheet(STATION, [second], [["19.10.2026"]])
+    assert writer._flush_worksheet(STATION, [second], [["19.10.2026"]])
+    assert outbox.pending_count() == 0
+    assert spreadsheet.sheets[STATION].rows == [["19.10.2026"]]
+    assert spreadsheet.listed == 2
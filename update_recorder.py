@@ -0,0 +1,64 @@
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+
+from telebot import types
+
+from dispatcher import update_json
+
+
+class UpdateRecorder:
+    """Записывает входящие обновления в сжатый JSONL и передаёт их дальше в target.
+
+    Ставится перед диспетчером (или общей очередью реплик): submit() совпадает
+    с ChatDispatcher.submit. Строка файла - {"at": время получения, "update": обновление
+    в JSON Bot API}. После перезапуска запись дописывается в тот же файл новым
+    gzip-блоком, gzip.open читает такие файлы целиком. В записи есть имена и
+    сообщения операторов - файл нельзя передавать за пределы команды.
+    """
+
+    def __init__(self, path, target):
+        self.target = target
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        atexit.register(self.close)  # Иначе gzip-блок останется без завершения
+
+    def submit(self, update):
+        line = json.dumps({"at": time.time(), "update": update_json(update)}, ensure_ascii=False)
+        try:
+            with self._lock:
+                if not self._file.closed:  # После close() при завершении обновления только передаются дальше
+                    self._file.write(line + "\n")
+                    self._file.flush()  # Запись не теряется, если процесс завершится аварийно
+        except OSError as e:
+            print(f"Ошибка записи обновления {update.update_id}: {e}")
+        self.target.submit(update)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_recording(path):
+    """Обновления из записи UpdateRecorder по порядку: (время получения, Update)"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        while True:
+            try:
+                line = f.readline()
+                record = json.loads(line) if line.strip() else None
+            except (EOFError, ValueError, zlib.error, gzip.BadGzipFile) as e:
+                # Хвост записи оборван аварийным завершением: читаем то, что уцелело
+                print(f"Запись {path} оборвана, дальше не читается: {e!r}")
+                return
+            if not line:
+                return
+            if record is not None:
+                yield record["at"], types.Update.de_json(record["update"])
@@ -0,0 +1,58 @@
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер для webhook Telegram: проверяет секрет, отвечает сразу,
+    а обработку передаёт диспетчеру"""
+
+    def __init__(self, dispatcher, secret_token, host="0.0.0.0", port=8443, path="/webhook"):
+        if not secret_token:
+            raise ValueError("Для режима webhook нужен WEBHOOK_SECRET")
+        self.dispatcher = dispatcher
+        self.secret_token = secret_token
+        self.path = path
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                secret = self.headers.get(SECRET_HEADER, "")
+                if not hmac.compare_digest(secret.encode(), server.secret_token.encode()):
+                    self._reply(403)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    update = types.Update.de_json(self.rfile.read(length).decode("utf-8"))
+                except (ValueError, KeyError, TypeError):
+                    self._reply(400)
+                    return
+                # Telegram получает ответ сразу, обработка идёт в потоках диспетчера
+                server.dispatcher.submit(update)
+                self._reply(200)
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
@@ -0,0 +1,132 @@
+import threading
+from concurrent.futures import TimeoutError
+
+from telebot import types
+from telebot.apihelper import ApiTelegramException
+
+# callback_data кнопок мастера: "w1:<шаг>:<номер варианта>"
+CALLBACK_PREFIX = "w1"
+ROW_TEXT_LIMIT = 30  # Длиннее - кнопки ряда идут по одной, иначе Telegram их обрезает
+
+
+class Wizard:
+    """Режим мастера: отчёт ведётся в одном сообщении, которое редактируется на каждом шаге.
+
+    Клавиатуры ответа заменяются inline-кнопками; нажатие превращается в обычное
+    текстовое сообщение с текстом кнопки, поэтому обработчики шагов не меняются.
+    Выключенный мастер отправляет сообщения как раньше. Запросы к Telegram идут
+    через очередь отправки sender.
+
+    Каждый шаг стоит ровно одного вызова Telegram: после нажатия - правка
+    сообщения, после введённого текста - новый вопрос. Без мастера к этому
+    добавляются удаления сообщений с календарём и кнопками (полный отчёт:
+    26 вызовов против 23). Меньше одного вызова на ответ оператора не бывает,
+    поэтому дальше число вызовов сокращается только объединением шагов.
+
+    Ответ Telegram ждётся не дольше timeout секунд: правка без ответа заменяется
+    новым сообщением, а номер отправленного сообщения запоминается, когда ответ придёт.
+    """
+
+    def __init__(self, bot, sender, store, enabled=True, timeout=10):
+        self.bot = bot
+        self.sender = sender
+        self.store = store
+        self.enabled = enabled
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def show(self, chat_id, text, reply_markup=None, replace=None):
+        """Показывает шаг отчёта; replace - сообщение, которое шаг заменяет (нажатая inline-кнопка)"""
+        report = self.store.get(chat_id) if self.enabled else None
+        if report is None:
+            if replace is not None:
+                self.sender.delete_message(chat_id, replace.message_id)
+            return self.sender.send_message(chat_id, text, reply_markup=reply_markup)
+
+        report.wizard_step += 1
+        report.wizard_options = []
+        if isinstance(reply_markup, types.ReplyKeyboardMarkup):
+            reply_markup = self._inline(report, reply_markup)
+        elif isinstance(reply_markup, types.ReplyKeyboardRemove):
+            reply_markup = None
+
+        # Сообщение редактируется, только если оператор ответил кнопкой на нём: после
+        # введённого текста вопрос оказался бы выше ответа, поэтому шаг идёт новым сообщением
+        message_id = replace.message_id if replace is not None else getattr(self._local, "message_id", None)
+        if message_id is not None and message_id == report.wizard_message_id:
+            try:
+                return self.sender.edit_message_text(text, chat_id, message_id,
+                                                     reply_markup=reply_markup).result(self.timeout)
+            except ApiTelegramException as e:
+                if "message is not modified" in e.description:
+                    return None
+                print(f"Не удалось изменить сообщение мастера: {e}")
+            except TimeoutError:
+                print(f"Чат {chat_id}: нет ответа на правку сообщения мастера за {self.timeout} с")
+        future = self.sender.send_message(chat_id, text, reply_markup=reply_markup)
+        try:
+            message = future.result(self.timeout)
+        except TimeoutError:
+            # Поток чата не ждёт дальше: до ответа следующий шаг придёт новым сообщением
+            report.wizard_message_id = None
+            step = report.wizard_step
+            future.add_done_callback(lambda sent: self._remember(chat_id, step, sent))
+            return None
+        report.wizard_message_id = message.message_id
+        return message
+
+    def _remember(self, chat_id, step, sent):
+        """Запоминает сообщение шага, отправленное после таймаута, если отчёт ещё на этом шаге"""
+        if sent.exception() is not None:
+            print(f"Не удалось отправить сообщение мастера: {sent.exception()}")
+            return
+        report = self.store.get(chat_id)
+        if report is not None and report.wizard_step == step:
+            report.wizard_message_id = sent.result().message_id
+            self.store.save(chat_id)
+
+    def is_tap(self, call):
+        return call.data.startswith(CALLBACK_PREFIX + ":")
+
+    def handle_tap(self, call):
+        """Передаёт нажатую кнопку мастера обработчикам как сообщение с её текстом"""
+        chat_id = call.message.chat.id
+        report = self.store.get(chat_id)
+        try:
+            _, step, index = call.data.split(":")
+            step, index = int(step), int(index)
+        except ValueError:
+            step, index = None, None
+        # Сообщения старше 48 часов приходят как InaccessibleMessage без текста и кнопок
+        if (report is None or not isinstance(call.message, types.Message) or step != report.wizard_step
+                or call.message.message_id != report.wizard_message_id
+                or not 0 <= index < len(report.wizard_options)):
+            self.sender.answer_callback_query(chat_id, call.id, "Кнопка устарела")
+            return
+
+        data = dict(call.message.json)
+        for key in ("reply_markup", "entities", "edit_date"):
+            data.pop(key, None)
+        data["from"] = call.from_user.to_dict()
+        data["text"] = report.wizard_options[index]
+        # Ответ на нажатие не отправляется: кнопка исчезает вместе с редактированием сообщения
+        self._local.message_id = call.message.message_id
+        try:
+            self.bot.process_new_messages([types.Message.de_json(data)])
+        finally:
+            self._local.message_id = None
+
+    def _inline(self, report, reply_markup):
+        markup = types.InlineKeyboardMarkup()
+        for row in reply_markup.keyboard:
+            buttons = []
+            for button in row:
+                buttons.append(types.InlineKeyboardButton(
+                    button["text"], callback_data=f"{CALLBACK_PREFIX}:{report.wizard_step}:{len(report.wizard_options)}"))
+                report.wizard_options.append(button["text"])
+            if sum(len(button.text) for button in buttons) > ROW_TEXT_LIMIT:
+                for button in buttons:
+                    markup.row(button)
+            else:
+                markup.row(*buttons)
+        return markup